@@ -1,52 +1,103 @@
-from flask import Flask, jsonify
-from routes.users_bp import usuarios_bp   # Ajusta la ruta según tu estructura
-from routes.products_bp import productos_bp
-from routes.sales_bp import sales_bp 
-from flask_jwt_extended import JWTManager
-from service.auth_services import BLACKLIST
+# app.py
+# Fábrica de la aplicación. Importar este módulo no abre la base ni carga las rutas:
+#   flask --app app run --debug         (desarrollo: migra la base al arrancar)
+#   gunicorn "app:create_app()"         (producción)
+#   flask --app app init-db             (migraciones, una vez por despliegue)
+#   flask --app app rebuild-rollups     (recalcula sales_rollup desde la tabla sales)
+import os
 from datetime import timedelta
-from database import init_db
+import click
+from flask import Flask, jsonify
+
+VALORES_SI = ("1", "true", "si", "sí")
+
+
+def _flag(nombre, default="0"):
+    return os.getenv(nombre, default).strip().lower() in VALORES_SI
+
+
+def config_from_env():
+    """Configuración tomada de variables de entorno (o del .env que carga database.py)."""
+    debug = _flag("FLASK_DEBUG")
+    return {
+        "DEBUG": debug,
+        "JWT_SECRET_KEY": os.getenv("JWT_SECRET_KEY", "TU_CLAVE_SECRETA_AQUI"),
+        "JWT_ACCESS_TOKEN_EXPIRES": timedelta(seconds=int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES", 30 * 24 * 3600))),
+        "JWT_BLACKLIST_ENABLED": True,
+        # Migrar al arrancar: cómodo en desarrollo; en producción lo hace `flask init-db` en el despliegue
+        "DB_MIGRATE_ON_START": _flag("DB_MIGRATE_ON_START", "1" if debug else "0"),
+    }
+
+
+def create_app(config=None):
+    """Crea la app; `config` (dict) sobrescribe lo leído del entorno."""
+    from flask_jwt_extended import JWTManager
+    from database import init_db, schema_is_current, db_path
+    from routes import usuarios_bp, productos_bp, sales_bp, jobs_bp
+    from service.auth_services import BLACKLIST
+
+    app = Flask(__name__)
+    app.config.update(config_from_env())
+    app.config.update(config or {})
 
+    # Sin migración al arrancar, cada worker solo comprueba la versión del esquema
+    if app.config["DB_MIGRATE_ON_START"]:
+        init_db()
+    if not schema_is_current():
+        mensaje = f"La base {db_path} no está en el esquema actual: ejecute `flask --app app init-db`"
+        if click.get_current_context(silent=True) is None:
+            raise RuntimeError(mensaje)
+        # Cargada por la CLI de Flask (p. ej. para `init-db`): los comandos funcionan,
+        # pero no se atiende ninguna petición hasta que el esquema esté al día
+        @app.before_request
+        def esquema_pendiente():
+            if not schema_is_current():
+                return jsonify({"success": False, "message": mensaje}), 503
 
-# Crear la app de Flask
-app = Flask(__name__)
+    jwt = JWTManager(app)
 
-# Inicializar la base de datos (si no existe)
-init_db()
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return jwt_payload["jti"] in BLACKLIST
 
-# Configuración JWT
-app.config["JWT_SECRET_KEY"] = "TU_CLAVE_SECRETA_AQUI"
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=30) #Para pruebas
-jwt = JWTManager(app)
-app.config['DEBUG'] = True
+    # Registrar blueprints
+    app.register_blueprint(usuarios_bp, url_prefix="/api")
+    app.register_blueprint(productos_bp, url_prefix="/api")
+    app.register_blueprint(sales_bp, url_prefix="/api")
+    app.register_blueprint(jobs_bp, url_prefix="/api")
 
+    # Ruta principal de prueba
+    @app.route("/")
+    def index():
+        return jsonify({"message": "API de E-commerce funcionando correctamente"}), 200
 
-app.config["JWT_BLACKLIST_ENABLED"] = True
+    # Manejo global de errores 500
+    @app.errorhandler(500)
+    def internal_error(error):
+        return jsonify({"success": False, "message": "Error interno del servidor"}), 500
 
-@jwt.token_in_blocklist_loader
-def check_if_token_revoked(jwt_header, jwt_payload):
-    return jwt_payload["jti"] in BLACKLIST
+    # Manejo de errores 404
+    @app.errorhandler(404)
+    def not_found_error(error):
+        return jsonify({"success": False, "message": "Recurso no encontrado"}), 404
 
-# Registrar blueprints
-app.register_blueprint(usuarios_bp, url_prefix="/api")
-app.register_blueprint(productos_bp, url_prefix="/api")
-app.register_blueprint(sales_bp, url_prefix="/api")
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Aplica las migraciones pendientes del esquema."""
+        init_db()
 
-# Ruta principal de prueba
-@app.route("/")
-def index():
-    return jsonify({"message": "API de E-commerce funcionando correctamente"}), 200
+    @app.cli.command("rebuild-rollups")
+    def rebuild_rollups_command():
+        """Recalcula los rollups de ventas desde cero."""
+        from service.rollup_service import rebuild_rollups
+        resultado = rebuild_rollups()
+        if not resultado["success"]:
+            raise click.ClickException(resultado["message"])
+        click.echo(resultado["message"])
 
-# Manejo global de errores 500
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({"success": False, "message": "Error interno del servidor"}), 500
+    return app
 
-# Manejo de errores 404
-@app.errorhandler(404)
-def not_found_error(error):
-    return jsonify({"success": False, "message": "Recurso no encontrado"}), 404
 
-# Ejecutar la app
+# Ejecutar la app (servidor de desarrollo: migra la base al arrancar)
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app({"DB_MIGRATE_ON_START": True}).run()
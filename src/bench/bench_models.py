@@ -0,0 +1,64 @@
+# bench/bench_models.py
+# Memoria por fila y tiempo de construcción de un listado de productos según la representación:
+# dict(row) (lo que devolvían los servicios), sqlite3.Row y el modelo Product como row factory.
+# Uso (desde src/): python -m bench.bench_models [filas] [repeticiones]
+import gc
+import os
+import sqlite3
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.bench_serializer import _productos
+from models import Product
+from routes.serializer import proyector, CAMPOS_PRODUCTO
+
+QUERY = "SELECT * FROM productos"
+
+
+def _memoria(funcion):
+    """Bytes por fila que siguen vivos después de construir el listado."""
+    gc.collect()
+    tracemalloc.start()
+    filas = funcion()
+    actual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return actual / len(filas), filas
+
+
+def _pasadas_gc(funcion):
+    """Recolecciones de la generación 0 que dispara construir el listado una vez."""
+    gc.collect()
+    antes = gc.get_stats()[0]["collections"]
+    funcion()
+    return gc.get_stats()[0]["collections"] - antes
+
+
+def main(filas=20000, repeticiones=10):
+    conn = _productos(filas)
+
+    def con_row():
+        conn.row_factory = sqlite3.Row
+        return conn.execute(QUERY).fetchall()
+
+    casos = [
+        ("dict(row)", lambda: [dict(r) for r in con_row()]),
+        ("sqlite3.Row", con_row),
+        ("Product (row factory)", lambda: Product.bind(conn.execute(QUERY)).fetchall()),
+    ]
+    formatear = proyector(CAMPOS_PRODUCTO)
+    print(f"{filas} filas")
+    print(f"{'':24} {'construir':>10} {'+ proyectar':>12} {'B/fila':>8} {'pasadas gc':>11}")
+    for nombre, funcion in casos:
+        t = timeit.timeit(funcion, number=repeticiones) / repeticiones
+        datos = funcion()
+        tp = timeit.timeit(lambda: [formatear(f) for f in datos], number=repeticiones) / repeticiones
+        del datos
+        por_fila, _ = _memoria(funcion)
+        print(f"{nombre:24} {t * 1000:8.1f}ms {tp * 1000:10.1f}ms {por_fila:8.0f} {_pasadas_gc(funcion):11}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,65 @@
+# bench/bench_scraper.py
+# Compara el parseo original (BeautifulSoup + html.parser sobre todo el documento)
+# con los backends del scraper sobre las páginas guardadas en bench/fixtures.
+# Uso (desde src/): python -m bench.bench_scraper [repeticiones]
+import os
+import sys
+import timeit
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service import html_backends
+from service.scraper_service import (
+    parse_product_page, parse_listing_page,
+    SELECTORS_NAME, SELECTORS_PRICE, SELECTORS_DESC, SELECTORS_CAT,
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _leer(nombre):
+    with open(os.path.join(FIXTURES, nombre), encoding="utf-8") as f:
+        return f.read()
+
+
+def producto_original(html):
+    """Ruta anterior: árbol completo con html.parser y select_one sin compilar."""
+    soup = BeautifulSoup(html, "html.parser")
+    for sel in SELECTORS_NAME + SELECTORS_PRICE + SELECTORS_DESC:
+        soup.select_one(sel)
+    for sel in SELECTORS_CAT:
+        soup.select(sel)
+
+
+def listado_original(html):
+    soup = BeautifulSoup(html, "html.parser")
+    for item in soup.select(".thumbnail"):
+        item.select_one(".title"), item.select_one(".description"), item.select_one(".price")
+
+
+def backends_disponibles():
+    nombres = ["html.parser"]
+    if html_backends.HAS_LXML:
+        nombres.append("lxml")
+    if html_backends.LexborHTMLParser is not None:
+        nombres.append("selectolax")
+    return nombres
+
+
+def main(repeticiones=50):
+    producto, listado = _leer("producto.html"), _leer("listado.html")
+    casos = [
+        ("producto", producto_original, lambda b: (lambda: parse_product_page(producto, b)), producto),
+        ("listado", listado_original, lambda b: (lambda: parse_listing_page(listado, "http://x/", "L", b)), listado),
+    ]
+    for nombre, original, nuevo, html in casos:
+        base = timeit.timeit(lambda: original(html), number=repeticiones) / repeticiones
+        print(f"{nombre:9} original        {base * 1000:8.2f} ms")
+        for backend in backends_disponibles():
+            t = timeit.timeit(nuevo(backend), number=repeticiones) / repeticiones
+            print(f"{nombre:9} {backend:15} {t * 1000:8.2f} ms  x{base / t:5.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,76 @@
+# bench/bench_serializer.py
+# Compara la serialización anterior de listados (dict(row) -> OrderedDict -> json.dumps indent=2)
+# con routes.serializer (proyección directa desde la fila + JSON compacto, con orjson si está instalado).
+# Uso (desde src/): python -m bench.bench_serializer [filas] [repeticiones]
+import json
+import os
+import sqlite3
+import sys
+import timeit
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes import serializer
+from routes.serializer import proyector, dumps, CAMPOS_PRODUCTO
+
+
+def _productos(n):
+    conn = sqlite3.connect(":memory:")
+    conn.execute('''
+        CREATE TABLE productos (
+            id INTEGER PRIMARY KEY, nombre TEXT, descripcion TEXT, precio REAL,
+            categoria TEXT, stock INTEGER, registro TEXT, url_origen TEXT
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO productos (nombre, descripcion, precio, categoria, stock, registro) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"Producto {i}", "Descripción de prueba con acentos: café, niño" * 2, i * 1.25, "Laptops", i % 50,
+          "2024-01-01 10:00:00") for i in range(n)]
+    )
+    return conn
+
+
+def formatear_original(producto):
+    return OrderedDict([
+        ("id", producto.get("id")),
+        ("nombre", producto.get("nombre")),
+        ("descripcion", producto.get("descripcion")),
+        ("precio", producto.get("precio")),
+        ("categoria", producto.get("categoria")),
+        ("stock", producto.get("stock")),
+        ("registro", producto.get("registro"))
+    ])
+
+
+def main(filas=1000, repeticiones=50):
+    conn = _productos(filas)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("SELECT * FROM productos").fetchall()
+    conn.row_factory = None
+    cursor = conn.execute("SELECT * FROM productos")
+    columnas = [d[0] for d in cursor.description]
+    tuplas = cursor.fetchall()
+
+    def original():
+        productos = [dict(row) for row in rows]
+        json.dumps({"success": True, "data": [formatear_original(p) for p in productos]}, indent=2)
+
+    desde_row = proyector(CAMPOS_PRODUCTO)
+    desde_tupla = proyector(CAMPOS_PRODUCTO, columnas)
+    casos = [
+        ("original (OrderedDict + indent=2)", original),
+        ("sqlite3.Row -> proyector", lambda: dumps({"success": True, "data": [desde_row(r) for r in rows]})),
+        ("dict(row) -> proyector", lambda: dumps({"success": True, "data": [desde_row(dict(r)) for r in rows]})),
+        ("tupla -> proyector", lambda: dumps({"success": True, "data": [desde_tupla(t) for t in tuplas]})),
+    ]
+    print(f"{filas} filas, encoder: {'orjson' if serializer.orjson is not None else 'json'}")
+    base = None
+    for nombre, funcion in casos:
+        t = timeit.timeit(funcion, number=repeticiones) / repeticiones
+        base = base or t
+        print(f"{nombre:36} {t * 1000:8.2f} ms  x{base / t:5.1f}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,61 @@
+# bench/import_budget.py
+# Presupuesto de arranque: tiempo de `import app` + create_app() en un proceso limpio, y que
+# ninguna dependencia pesada (openpyxl, bs4, requests, numpy) se cargue antes de usarse.
+# Termina con código 1 si se excede el presupuesto, para poder usarlo en CI.
+# Uso (desde src/): python -m bench.import_budget [presupuesto_ms]
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 400))
+PESADOS = ("openpyxl", "bs4", "requests", "numpy", "soupsieve")
+
+# Se ejecuta en un intérprete nuevo: lo ya importado por este script no cuenta
+MEDICION = f"""
+import json, sys, time
+inicio = time.perf_counter()
+import app
+importado = time.perf_counter()
+app.create_app({{"DB_MIGRATE_ON_START": True}})
+fin = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (importado - inicio) * 1000,
+    "create_app_ms": (fin - importado) * 1000,
+    "pesados": [m for m in {PESADOS!r} if m in sys.modules],
+}}))
+"""
+
+
+def medir(repeticiones=3):
+    """Mejor de `repeticiones` arranques, cada uno con una base temporal vacía."""
+    resultados = []
+    for _ in range(repeticiones):
+        with tempfile.TemporaryDirectory() as directorio:
+            entorno = {**os.environ, "DATABASE": os.path.join(directorio, "budget.db")}
+            salida = subprocess.run([sys.executable, "-c", MEDICION], cwd=SRC, env=entorno,
+                                    capture_output=True, text=True, check=True).stdout
+        resultados.append(json.loads(salida.strip().splitlines()[-1]))
+    return min(resultados, key=lambda r: r["import_ms"] + r["create_app_ms"])
+
+
+def main(presupuesto=IMPORT_BUDGET_MS):
+    r = medir()
+    total = r["import_ms"] + r["create_app_ms"]
+    print(f"import app     {r['import_ms']:8.1f} ms")
+    print(f"create_app()   {r['create_app_ms']:8.1f} ms")
+    print(f"total          {total:8.1f} ms  (presupuesto {presupuesto:g} ms)")
+    errores = []
+    if total > presupuesto:
+        errores.append(f"arranque de {total:.0f} ms supera el presupuesto de {presupuesto:g} ms")
+    if r["pesados"]:
+        errores.append(f"módulos pesados cargados al arrancar: {', '.join(r['pesados'])}")
+    for error in errores:
+        print(f"ERROR: {error}")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(float(a) for a in sys.argv[1:2])))
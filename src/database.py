@@ -1,5 +1,8 @@
 import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,66 +10,434 @@ load_dotenv()
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 db_path = os.getenv("DATABASE", os.path.join(BASE_DIR, "ecommerce.db"))
 
-def get_connection():
-    conn = sqlite3.connect(db_path)
+# Configuración del pool de conexiones
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+CACHED_STATEMENTS = int(os.getenv("DB_CACHED_STATEMENTS", 256))
+STREAM_CHUNK_SIZE = int(os.getenv("DB_STREAM_CHUNK_SIZE", 500))
+
+
+def get_connection(path=None):
+    """
+    Abre una conexión nueva ya configurada (WAL, busy_timeout, synchronous=NORMAL).
+    Los servicios no deben usarla directamente: usar get_db() para reutilizar conexiones del pool
+    (o iter_chunks para recorrer consultas largas).
+    """
+    conn = sqlite3.connect(
+        path or db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=CACHED_STATEMENTS,
+        check_same_thread=False,  # la conexión puede pasar de un hilo a otro a través del pool
+    )
     conn.row_factory = sqlite3.Row  # Para acceder a columnas como diccionarios
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous=NORMAL")
     return conn
 
-def init_db():
+
+class ConnectionPool:
+    """Pool acotado de conexiones SQLite reutilizables (LIFO para mantener calientes las más usadas)."""
+
+    def __init__(self, path, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._pid = os.getpid()
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("No hay conexiones disponibles en el pool")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return get_connection(self.path)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+        except sqlite3.Error:
+            # Conexión rota: se descarta y se abrirá otra cuando haga falta
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        # Tras un fork (p. ej. workers WSGI) no se comparten conexiones con el proceso padre
+        if _pool is None or _pool.path != db_path or _pool._pid != os.getpid():
+            _pool = ConnectionPool(db_path)
+        return _pool
+
+
+@contextmanager
+def get_db():
+    """
+    Presta una conexión del pool.
+    Hace commit al salir sin errores y rollback si se lanza una excepción.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
 
-        # Tabla usuarios
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombres TEXT NOT NULL,
-            apellidos TEXT NOT NULL,
-            edad INTEGER NOT NULL,
-            telefono TEXT UNIQUE,
-            correo TEXT UNIQUE,
-            clave_hash TEXT NOT NULL,
-            ciudad TEXT NOT NULL,
-            pais TEXT NOT NULL,
-            registro TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
 
-        # Tabla productos
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS productos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre TEXT NOT NULL,
-            descripcion TEXT,
-            precio REAL NOT NULL,
-            categoria TEXT NOT NULL,
-            stock INTEGER NOT NULL,
-            registro TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
+def iter_chunks(query, params=(), chunk_size=STREAM_CHUNK_SIZE, model=None):
+    """
+    Generador que recorre la consulta con fetchmany y entrega listas de filas de tamaño acotado.
+    Con `model` (ver models.base) las filas son instancias del modelo en lugar de sqlite3.Row.
+    Usa una conexión propia, fuera del pool, que se abre con el primer bloque y se cierra al
+    agotarse o cerrarse el generador: un cliente lento no retiene conexiones de las peticiones.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.execute(query, params)
+        if model is not None:
+            model.bind(cursor)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+# Esquema base (versión 0): tablas originales del proyecto
+BASE_SCHEMA = [
+    # Tabla usuarios
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombres TEXT NOT NULL,
+        apellidos TEXT NOT NULL,
+        edad INTEGER NOT NULL,
+        telefono TEXT UNIQUE,
+        correo TEXT UNIQUE,
+        clave_hash TEXT NOT NULL,
+        ciudad TEXT NOT NULL,
+        pais TEXT NOT NULL,
+        registro TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    # Tabla productos
+    '''
+    CREATE TABLE IF NOT EXISTS productos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        descripcion TEXT,
+        precio REAL NOT NULL,
+        categoria TEXT NOT NULL,
+        stock INTEGER NOT NULL,
+        registro TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    # Tabla ventas
+    '''
+    CREATE TABLE IF NOT EXISTS sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        cantidad INTEGER NOT NULL,
+        total REAL NOT NULL,
+        fecha TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (product_id) REFERENCES productos (id)
+    )
+    ''',
+]
+
+# Rollups de ventas: dimensión -> expresión SQL de la clave ({fila} es new u old dentro del trigger)
+ROLLUP_DIMENSIONES = (
+    ("dia", "substr({fila}.fecha, 1, 10)"),
+    ("mes", "substr({fila}.fecha, 1, 7)"),
+    ("producto", "{fila}.product_id"),
+    ("categoria", "COALESCE((SELECT categoria FROM productos WHERE id = {fila}.product_id), 'Sin categoría')"),
+    ("usuario", "{fila}.user_id"),
+)
+
 
-        # Tabla ventas
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sales (
+def _rollup_upsert(fila, signo, dimension, expr):
+    return f'''
+            INSERT INTO sales_rollup (dimension, clave, ventas, unidades, ingresos)
+            VALUES ('{dimension}', {expr.format(fila=fila)}, {signo}, {signo} * {fila}.cantidad, {signo} * {fila}.total)
+            ON CONFLICT (dimension, clave) DO UPDATE SET
+                ventas = ventas + excluded.ventas,
+                unidades = unidades + excluded.unidades,
+                ingresos = ingresos + excluded.ingresos;'''
+
+
+def _rollup_mover_categoria(product_id, desde, hacia):
+    """Pasa los totales de las ventas de un producto del bucket de categoría `desde` al de `hacia`."""
+    return "".join(f'''
+            INSERT INTO sales_rollup (dimension, clave, ventas, unidades, ingresos)
+            SELECT 'categoria', {clave}, {signo} * COUNT(*), {signo} * SUM(cantidad), {signo} * SUM(total)
+            FROM sales WHERE product_id = {product_id} HAVING COUNT(*) > 0
+            ON CONFLICT (dimension, clave) DO UPDATE SET
+                ventas = ventas + excluded.ventas,
+                unidades = unidades + excluded.unidades,
+                ingresos = ingresos + excluded.ingresos;''' for clave, signo in ((desde, -1), (hacia, 1)))
+
+
+# Recalcula todos los rollups desde la tabla sales (backfill)
+ROLLUP_REBUILD = ["DELETE FROM sales_rollup"] + [
+    f'''
+    INSERT INTO sales_rollup (dimension, clave, ventas, unidades, ingresos)
+    SELECT '{dimension}', {expr.format(fila="s")} AS clave, COUNT(*), SUM(s.cantidad), SUM(s.total)
+    FROM sales s GROUP BY clave
+    ''' for dimension, expr in ROLLUP_DIMENSIONES
+]
+
+# Registro de cambios: cada escritura sobre estas tablas deja en `cambios` la última operación
+# de la fila con un número de secuencia creciente (una fila por registro, no un historial)
+TABLAS_CAMBIOS = ("users", "productos", "sales")
+
+
+def _registrar_cambio(tabla, fila, operacion):
+    return f'''
+            UPDATE cambios_seq SET valor = valor + 1 WHERE id = 1;
+            INSERT INTO cambios (tabla, fila_id, seq, operacion, fecha)
+            VALUES ('{tabla}', {fila}.id, (SELECT valor FROM cambios_seq WHERE id = 1), '{operacion}', CURRENT_TIMESTAMP)
+            ON CONFLICT (tabla, fila_id) DO UPDATE SET
+                seq = excluded.seq, operacion = excluded.operacion, fecha = excluded.fecha;'''
+
+
+# Migraciones versionadas: la posición en la lista (empezando en 1) es la versión
+# que queda registrada en PRAGMA user_version. Nunca modificar una migración ya publicada.
+MIGRATIONS = [
+    # 1: índices secundarios para los filtros de ventas, productos y usuarios
+    [
+        "CREATE INDEX IF NOT EXISTS idx_sales_user_fecha ON sales (user_id, fecha)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_product_fecha ON sales (product_id, fecha)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_fecha ON sales (fecha)",
+        "CREATE INDEX IF NOT EXISTS idx_productos_categoria ON productos (categoria)",
+        "CREATE INDEX IF NOT EXISTS idx_users_pais_ciudad_edad ON users (pais, ciudad, edad)",
+    ],
+    # 2: índice de texto completo (FTS5) sobre nombre y descripción de productos, sin acentos
+    [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+            nombre, descripcion,
+            content='productos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+            INSERT INTO productos_fts (rowid, nombre, descripcion) VALUES (new.id, new.nombre, new.descripcion);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion)
+            VALUES ('delete', old.id, old.nombre, old.descripcion);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE OF nombre, descripcion ON productos BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion)
+            VALUES ('delete', old.id, old.nombre, old.descripcion);
+            INSERT INTO productos_fts (rowid, nombre, descripcion) VALUES (new.id, new.nombre, new.descripcion);
+        END
+        ''',
+        "INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')",
+    ],
+    # 3: clave natural de productos importados (URL de origen) para upserts idempotentes
+    [
+        "ALTER TABLE productos ADD COLUMN url_origen TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_productos_url_origen ON productos (url_origen) WHERE url_origen IS NOT NULL",
+    ],
+    # 4: rollups de ventas (día, mes, producto, categoría, usuario) mantenidos por triggers
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS sales_rollup (
+            dimension TEXT NOT NULL,
+            clave NOT NULL,
+            ventas INTEGER NOT NULL DEFAULT 0,
+            unidades INTEGER NOT NULL DEFAULT 0,
+            ingresos REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, clave)
+        ) WITHOUT ROWID
+        ''',
+        *[f'''
+        CREATE TRIGGER IF NOT EXISTS sales_rollup_{nombre} AFTER {evento} ON sales BEGIN
+            {cuerpo}
+        END
+        ''' for nombre, evento, cuerpo in (
+            ("ai", "INSERT", "".join(_rollup_upsert("new", 1, dim, expr) for dim, expr in ROLLUP_DIMENSIONES)),
+            ("ad", "DELETE", "".join(_rollup_upsert("old", -1, dim, expr) for dim, expr in ROLLUP_DIMENSIONES)),
+            ("au", "UPDATE OF user_id, product_id, cantidad, total, fecha",
+             "".join(_rollup_upsert("old", -1, dim, expr) + _rollup_upsert("new", 1, dim, expr)
+                     for dim, expr in ROLLUP_DIMENSIONES)),
+        )],
+        *ROLLUP_REBUILD,
+    ],
+    # 5: cola de trabajos en segundo plano (exportaciones y reportes)
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            params TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            filas INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            path TEXT,
+            message TEXT,
+            creado REAL NOT NULL,
+            actualizado REAL NOT NULL,
+            expira REAL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_jobs_clave_estado ON jobs (clave, estado)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_expira ON jobs (expira) WHERE expira IS NOT NULL",
+    ],
+    # 6: registro de cambios por fila (última operación y secuencia) para exportaciones incrementales
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS cambios (
+            tabla TEXT NOT NULL,
+            fila_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            operacion TEXT NOT NULL,
+            fecha TEXT NOT NULL,
+            PRIMARY KEY (tabla, fila_id)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_cambios_tabla_seq ON cambios (tabla, seq)",
+        "CREATE TABLE IF NOT EXISTS cambios_seq (id INTEGER PRIMARY KEY CHECK (id = 1), valor INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO cambios_seq (id, valor) VALUES (1, 0)",
+        '''
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            tabla TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            actualizado TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        *[f'''
+        CREATE TRIGGER IF NOT EXISTS cambios_{tabla}_{nombre} AFTER {evento} ON {tabla} BEGIN
+            {_registrar_cambio(tabla, fila, operacion)}
+        END
+        ''' for tabla in TABLAS_CAMBIOS for nombre, evento, fila, operacion in (
+            ("ai", "INSERT", "new", "upsert"),
+            ("au", "UPDATE", "new", "upsert"),
+            ("ad", "DELETE", "old", "delete"),
+        )],
+    ],
+    # 7: tokens revocados (logout) compartidos entre procesos, con su expiración para poder purgarlos
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS token_blocklist (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            product_id INTEGER NOT NULL,
-            cantidad INTEGER NOT NULL,
-            total REAL NOT NULL,
-            fecha TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (product_id) REFERENCES productos (id)
+            jti TEXT NOT NULL UNIQUE,
+            exp INTEGER NOT NULL
         )
-        ''')
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_token_blocklist_exp ON token_blocklist (exp)",
+    ],
+    # 8: la categoría de las ventas es la actual del producto; al cambiarla (o al crear/borrar el
+    # producto) sus ventas pasan de un bucket de categoría a otro y se recalcula lo ya acumulado
+    [
+        '''
+        CREATE TRIGGER IF NOT EXISTS sales_rollup_categoria_au AFTER UPDATE OF categoria ON productos
+        WHEN old.categoria IS NOT new.categoria BEGIN
+            {}
+        END
+        '''.format(_rollup_mover_categoria("old.id", "old.categoria", "new.categoria")),
+        '''
+        CREATE TRIGGER IF NOT EXISTS sales_rollup_categoria_ad AFTER DELETE ON productos BEGIN
+            {}
+        END
+        '''.format(_rollup_mover_categoria("old.id", "old.categoria", "'Sin categoría'")),
+        '''
+        CREATE TRIGGER IF NOT EXISTS sales_rollup_categoria_ai AFTER INSERT ON productos BEGIN
+            {}
+        END
+        '''.format(_rollup_mover_categoria("new.id", "'Sin categoría'", "new.categoria")),
+        *ROLLUP_REBUILD,
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
 
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Aplica las migraciones pendientes en una sola transacción y devuelve la versión final.
+    Si la base ya está al día solo cuesta una lectura de PRAGMA user_version.
+    """
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return get_schema_version(conn)
+
+    # BEGIN IMMEDIATE evita que dos procesos migren a la vez; se relee la versión ya con el lock
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = get_schema_version(conn)
+        if version == 0:
+            for sql in BASE_SCHEMA:
+                conn.execute(sql)
+        for numero, pasos in enumerate(MIGRATIONS[version:], start=version + 1):
+            for sql in pasos:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version={numero}")
         conn.commit()
-        print(f"Base de datos inicializada en {db_path}")
+    except Exception:
+        conn.rollback()
+        raise
+    return get_schema_version(conn)
+
+
+def init_db():
+    try:
+        with get_db() as conn:
+            version = migrate(conn)
+        print(f"Base de datos inicializada en {db_path} (esquema v{version})")
 
     except Exception as e:
         print(f"Error al inicializar la DB: {e}")
-    finally:
-        conn.close()
+
+
+def schema_is_current():
+    """Comprobación de arranque para los workers que no migran: una lectura de PRAGMA user_version."""
+    with get_db() as conn:
+        return get_schema_version(conn) >= SCHEMA_VERSION
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,22 @@
+import os
+from exports.stream_writer import write_export, export_filename
+from service.change_service import changes_since, save_watermark
+
+def export_delta(tabla, nombre, formato, comprimir, directorio, columnas=None, avance=None):
+    """
+    Exportación incremental: solo las filas que cambiaron desde la última marca de agua de la tabla
+    (borradas como tombstones). La nueva marca se guarda únicamente si el archivo se escribió bien.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    cambios = changes_since(tabla, columnas)
+    if not cambios["success"]:
+        return cambios
+
+    path = os.path.join(directorio, export_filename(f"{nombre}_cambios_{cambios['desde'] or 0}_{cambios['hasta']}", formato, comprimir))
+    escritos = write_export(cambios["data"], path, formato, cambios["columnas"], comprimir, avance)
+    save_watermark(tabla, cambios["hasta"])
+    if not escritos:
+        os.remove(path)
+        return {"success": False, "message": "No hay cambios desde la última exportación"}
+    return {"success": True, "message": f"Cambios exportados a {path}", "path": path,
+            "desde": cambios["desde"], "hasta": cambios["hasta"]}
@@ -1,6 +1,6 @@
-import csv
-import json
 import os
+from exports.stream_writer import formato_no_soportado, write_export, export_filename
+from exports.export_delta import export_delta
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 EXPORT_DIR = os.path.join(BASE_DIR, "../exports")
@@ -8,28 +8,25 @@ EXPORT_DIR = os.path.join(BASE_DIR, "../exports")
 # Crear carpeta de exportaciones si no existe
 os.makedirs(EXPORT_DIR, exist_ok=True)
 
-def export_products(productos, formato="json"):
+def export_products(productos=None, formato="json", comprimir=False, directorio=EXPORT_DIR, avance=None, incremental=False):
+    """
+    productos: iterable de bloques de filas (por ejemplo stream_products()["data"]).
+    incremental=True ignora `productos` y exporta solo los cambios desde la última exportación.
+    """
+    os.makedirs(directorio, exist_ok=True)
     try:
-        if not productos:
-            return {"success": False, "message": "No hay productos para exportar"}
-
-        if formato.lower() == "csv":
-            file_path = os.path.join(EXPORT_DIR, "productos_export.csv")
-            keys = productos[0].keys()
-            with open(file_path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=keys)
-                writer.writeheader()
-                writer.writerows(productos)
-            return {"success": True, "message": f"Archivo CSV generado en {file_path}"}
+        formato = formato.lower()
+        error = formato_no_soportado(formato)
+        if error:
+            return {"success": False, "message": error}
+        if incremental:
+            return export_delta("productos", "productos", formato, comprimir, directorio, avance=avance)
 
-        elif formato.lower() == "json":
-            file_path = os.path.join(EXPORT_DIR, "productos_export.json")
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(productos, f, indent=4, ensure_ascii=False)
-            return {"success": True, "message": f"Archivo JSON generado en {file_path}"}
-
-        else:
-            return {"success": False, "message": f"Formato {formato} no soportado"}
+        file_path = os.path.join(directorio, export_filename("productos_export", formato, comprimir))
+        if not write_export(productos, file_path, formato, comprimir=comprimir, avance=avance):
+            os.remove(file_path)
+            return {"success": False, "message": "No hay productos para exportar"}
+        return {"success": True, "message": f"Archivo {formato.upper()} generado en {file_path}", "path": file_path}
 
     except Exception as e:
         return {"success": False, "message": f"Error en la exportación: {e}"}
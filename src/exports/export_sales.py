@@ -1,25 +1,26 @@
-import csv, json
 import os
+from exports.stream_writer import formato_no_soportado, write_export, export_filename
+from exports.export_delta import export_delta
 
-def export_sales(ventas, formato="json"):
-    os.makedirs("exports", exist_ok=True)
+def export_sales(ventas=None, formato="json", comprimir=False, directorio="exports", avance=None, incremental=False):
+    """
+    ventas: iterable de bloques de filas (por ejemplo stream_sales()["data"]).
+    incremental=True ignora `ventas` y exporta solo los cambios desde la última exportación.
+    """
+    os.makedirs(directorio, exist_ok=True)
     try:
-        if not ventas:
+        formato = formato.lower()
+        error = formato_no_soportado(formato)
+        if error:
+            return {"success": False, "message": error}
+        if incremental:
+            return export_delta("sales", "ventas", formato, comprimir, directorio, avance=avance)
+        path = os.path.join(directorio, export_filename("ventas", formato, comprimir))
+        if not write_export(ventas, path, formato, comprimir=comprimir, avance=avance):
+            os.remove(path)
             return {"success": False, "message": "No hay ventas para exportar."}
 
-        if formato.lower() == "csv":
-            path = "exports/ventas.csv"
-            with open(path, mode="w", newline="", encoding="utf-8") as file:
-                writer = csv.DictWriter(file, fieldnames=ventas[0].keys())
-                writer.writeheader()
-                for v in ventas:
-                    writer.writerow(v)
-        else:  # JSON
-            path = "exports/ventas.json"
-            with open(path, "w", encoding="utf-8") as file:
-                json.dump(ventas, file, indent=4, ensure_ascii=False)
-
-        return {"success": True, "message": f"Ventas exportadas a {path}"}
+        return {"success": True, "message": f"Ventas exportadas a {path}", "path": path}
 
     except Exception as e:
         return {"success": False, "message": f"Error al exportar ventas: {e}"}
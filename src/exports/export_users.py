@@ -1,25 +1,29 @@
-import csv, json
 import os
+from exports.stream_writer import formato_no_soportado, write_export, export_filename
+from exports.export_delta import export_delta
 
-def export_users(usuarios, formato="json"):
-    os.makedirs("exports", exist_ok=True)
+# El hash de la contraseña nunca sale en una exportación
+COLUMNAS_USUARIO = ("id", "nombres", "apellidos", "edad", "telefono", "correo", "ciudad", "pais", "registro")
+
+def export_users(usuarios=None, formato="json", comprimir=False, directorio="exports", avance=None, incremental=False):
+    """
+    usuarios: iterable de bloques de filas (por ejemplo stream_users()["data"]).
+    incremental=True ignora `usuarios` y exporta solo los cambios desde la última exportación.
+    """
+    os.makedirs(directorio, exist_ok=True)
     try:
-        if not usuarios:
+        formato = formato.lower()
+        error = formato_no_soportado(formato)
+        if error:
+            return {"success": False, "message": error}
+        if incremental:
+            return export_delta("users", "usuarios", formato, comprimir, directorio, COLUMNAS_USUARIO, avance)
+        path = os.path.join(directorio, export_filename("usuarios", formato, comprimir))
+        if not write_export(usuarios, path, formato, COLUMNAS_USUARIO, comprimir, avance):
+            os.remove(path)
             return {"success": False, "message": "No hay usuarios para exportar."}
 
-        if formato.lower() == "csv":
-            path = "exports/usuarios.csv"
-            with open(path, mode="w", newline="", encoding="utf-8") as file:
-                writer = csv.DictWriter(file, fieldnames=usuarios[0].keys())
-                writer.writeheader()
-                for u in usuarios:
-                    writer.writerow(u)
-        else:  # JSON
-            path = "exports/usuarios.json"
-            with open(path, "w", encoding="utf-8") as file:
-                json.dump(usuarios, file, indent=4, ensure_ascii=False)
-
-        return {"success": True, "message": f"Usuarios exportados a {path}"}
+        return {"success": True, "message": f"Usuarios exportados a {path}", "path": path}
 
     except Exception as e:
         return {"success": False, "message": f"Error al exportar usuarios: {e}"}
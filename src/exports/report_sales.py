@@ -0,0 +1,56 @@
+import os
+from service.sales_services import month_range, stream_sales_between, get_daily_totals
+
+def monthly_report(mes, año, directorio="exports", avance=None):
+    """
+    Genera el reporte mensual en Excel.
+    El filtro del mes se resuelve en SQL y las filas se escriben en modo write-only
+    (streaming), así que la memoria no crece con el número de ventas. El gráfico usa
+    los totales por día en lugar de una barra por venta.
+    """
+    try:
+        # openpyxl solo se carga cuando se genera un reporte
+        from openpyxl import Workbook
+        from openpyxl.chart import BarChart, Reference
+
+        desde, hasta = month_range(año, mes)
+        resumen = get_daily_totals(desde, hasta)
+        if not resumen["success"]:
+            return resumen
+        if not resumen["data"]:
+            return {"success": False, "message": "No hay ventas en ese mes", "status": 404}
+
+        ventas = stream_sales_between(desde, hasta)
+        if not ventas["success"]:
+            return ventas
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(f"Ventas {mes}-{año}")
+        ws.append(["ID Venta", "Usuario", "Producto", "Cantidad", "Total", "Fecha"])
+        for filas in ventas["data"]:
+            for v in filas:
+                ws.append([v["id"], v["user_id"], v["product_id"], v["cantidad"], v["total"], v["fecha"]])
+            if avance:
+                avance(len(filas))
+
+        ws_dias = wb.create_sheet("Resumen diario")
+        ws_dias.append(["Día", "Ventas", "Unidades", "Total"])
+        for d in resumen["data"]:
+            ws_dias.append([d["dia"], d["ventas"], d["unidades"], d["ingresos"]])
+
+        dias = len(resumen["data"])
+        chart = BarChart()
+        data = Reference(ws_dias, min_col=4, min_row=1, max_row=dias + 1)
+        cats = Reference(ws_dias, min_col=1, min_row=2, max_row=dias + 1)
+        chart.add_data(data, titles_from_data=True)
+        chart.set_categories(cats)
+        chart.title = "Ventas Totales por Día"
+        ws_dias.add_chart(chart, "F2")
+
+        os.makedirs(directorio, exist_ok=True)
+        path = os.path.join(directorio, f"reporte_ventas_{mes}_{año}.xlsx")
+        wb.save(path)
+        return {"success": True, "message": f"Reporte generado: {path}", "path": path}
+
+    except Exception as e:
+        return {"success": False, "message": f"Error al generar reporte mensual: {e}"}
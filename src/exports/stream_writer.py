@@ -0,0 +1,108 @@
+# exports/stream_writer.py
+import csv
+import io
+import json
+import zlib
+
+# Escritura incremental de exportaciones: consume bloques de filas (listas de sqlite3.Row o dicts)
+# y produce CSV, NDJSON o JSON sin tener nunca la tabla completa en memoria.
+
+FORMATOS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "json": ("application/json", "json"),
+}
+
+
+def formato_no_soportado(formato):
+    """None si `formato` es uno de FORMATOS; si no, el mensaje de error común a rutas y exportadores."""
+    if formato in FORMATOS:
+        return None
+    return f"Formato {formato} no soportado, use uno de: {', '.join(FORMATOS)}"
+
+
+def peek(chunks):
+    """Devuelve (primer_bloque, iterador_completo) o (None, None) si no hay filas."""
+    chunks = iter(chunks)
+    for primero in chunks:
+        if primero:
+            def todos():
+                yield primero
+                yield from chunks
+            return primero, todos()
+    return None, None
+
+
+def _filas(chunks, columnas, avance=None):
+    for bloque in chunks:
+        yield [{c: fila[c] for c in columnas} for fila in bloque]
+        if avance:
+            avance(len(bloque))
+
+
+def _csv(chunks, columnas, avance=None):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columnas)
+    writer.writeheader()
+    for bloque in _filas(chunks, columnas, avance):
+        writer.writerows(bloque)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson(chunks, columnas, avance=None):
+    for bloque in _filas(chunks, columnas, avance):
+        yield "".join(json.dumps(fila, ensure_ascii=False) + "\n" for fila in bloque)
+
+
+def _json(chunks, columnas, avance=None):
+    yield "["
+    primero = True
+    for bloque in _filas(chunks, columnas, avance):
+        texto = ",\n".join(json.dumps(fila, ensure_ascii=False) for fila in bloque)
+        yield texto if primero else ",\n" + texto
+        primero = False
+    yield "]\n"
+
+
+def iter_export(chunks, formato="json", columnas=None, comprimir=False, avance=None):
+    """
+    Generador de bytes con el archivo exportado, listo para escribir a disco o enviar al cliente.
+    Si columnas es None se usan las de la primera fila. comprimir=True produce gzip.
+    avance(n), si se indica, se llama con el número de filas de cada bloque ya escrito.
+    """
+    primero, chunks = peek(chunks)
+    if primero is None:
+        return
+    columnas = list(columnas or primero[0].keys())
+    generador = {"csv": _csv, "ndjson": _ndjson, "json": _json}[formato](chunks, columnas, avance)
+    if not comprimir:
+        for texto in generador:
+            yield texto.encode("utf-8")
+        return
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for texto in generador:
+        datos = gz.compress(texto.encode("utf-8"))
+        if datos:
+            yield datos
+    yield gz.flush()
+
+
+def write_export(chunks, path, formato="json", columnas=None, comprimir=False, avance=None):
+    """Escribe la exportación en disco bloque a bloque. Devuelve el número de bytes escritos."""
+    escritos = 0
+    with open(path, "wb") as f:
+        for datos in iter_export(chunks, formato, columnas, comprimir, avance):
+            f.write(datos)
+            escritos += len(datos)
+    return escritos
+
+
+def export_filename(base, formato, comprimir=False):
+    return f"{base}.{FORMATOS[formato][1]}" + (".gz" if comprimir else "")
+
+
+def export_mimetype(formato, comprimir=False):
+    return "application/gzip" if comprimir else FORMATOS[formato][0]
@@ -1,3 +1,6 @@
+from models.base import Model
+from models.product import Product
+from models.sales import Sale
 from models.users import Usuario
 
-__all__ = ["Usuario"]
+__all__ = ["Model", "Product", "Sale", "Usuario"]
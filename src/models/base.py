@@ -0,0 +1,127 @@
+# models/base.py
+# Base de los modelos de dominio: tuplas inmutables (__slots__ vacío, sin __dict__ por instancia)
+# que el cursor de SQLite construye directamente como row factory, sin pasar por sqlite3.Row ni dict.
+from dataclasses import Field, MISSING
+from datetime import datetime, timezone
+from operator import itemgetter
+
+
+def ahora():
+    """Fecha actual en UTC con el formato de CURRENT_TIMESTAMP, como los DEFAULT y triggers de SQLite."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Model(tuple):
+    """
+    Los campos se declaran como anotaciones de clase, en el orden de las columnas de la tabla;
+    un valor por defecto puede ser un valor fijo o field(default_factory=...), que se evalúa
+    en cada construcción.
+
+    Una consulta que selecciona solo algunas columnas produce instancias de una "forma" del
+    modelo: subclase cacheada por conjunto de columnas, que guarda únicamente esos valores.
+    Los campos no seleccionados valen None y no aparecen en keys() ni en to_dict().
+    Además de los atributos, admite fila["campo"], keys() y dict(fila), como sqlite3.Row.
+    """
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "__annotations__" not in cls.__dict__:  # forma creada por shape()
+            return
+        campos = tuple(cls.__annotations__)
+        cls._defaults = {}
+        for i, campo in enumerate(campos):
+            valor = cls.__dict__.get(campo, MISSING)
+            if isinstance(valor, Field):
+                cls._defaults[campo] = valor.default_factory if valor.default_factory is not MISSING \
+                    else (lambda v=valor.default: v)
+            elif valor is not MISSING:
+                cls._defaults[campo] = lambda v=valor: v
+            setattr(cls, campo, property(itemgetter(i), doc=campo))
+        cls._model = cls
+        cls._fields = cls._all_fields = campos
+        cls._index = {campo: i for i, campo in enumerate(campos)}
+        cls._shapes = {campos: cls}
+
+    def __new__(cls, *args, **kwargs):
+        """Construcción directa, con nombres o posiciones y los valores por defecto declarados."""
+        if len(args) > len(cls._fields):
+            raise TypeError(f"{cls.__name__} recibe como máximo {len(cls._fields)} valores")
+        valores = list(args)
+        for campo in cls._fields[len(args):]:
+            if campo in kwargs:
+                valores.append(kwargs.pop(campo))
+            elif campo in cls._defaults:
+                valores.append(cls._defaults[campo]())
+            else:
+                raise TypeError(f"{cls.__name__}: falta el campo {campo}")
+        if kwargs:
+            raise TypeError(f"{cls.__name__}: campos desconocidos: {', '.join(kwargs)}")
+        return tuple.__new__(cls, valores)
+
+    @classmethod
+    def shape(cls, columnas):
+        """Clase de las instancias con exactamente estas columnas, en este orden."""
+        columnas = tuple(columnas)
+        forma = cls._shapes.get(columnas)
+        if forma is None:
+            modelo = cls._model
+            desconocidas = [c for c in columnas if c not in modelo._index]
+            if desconocidas:
+                raise ValueError(f"{modelo.__name__} no tiene los campos: {', '.join(desconocidas)}")
+            atributos = {campo: None for campo in modelo._all_fields}
+            atributos.update({campo: property(itemgetter(i), doc=campo) for i, campo in enumerate(columnas)})
+            atributos.update(__slots__=(), _fields=columnas, _index={c: i for i, c in enumerate(columnas)},
+                             __module__=modelo.__module__, __qualname__=modelo.__qualname__)
+            forma = modelo._shapes.setdefault(columnas, type(modelo.__name__, (modelo,), atributos))
+        return forma
+
+    @classmethod
+    def row_factory(cls, cursor):
+        """Row factory para un cursor ya ejecutado: cada tupla de SQLite pasa a ser la instancia tal cual."""
+        forma = cls.shape(d[0] for d in cursor.description)
+        nueva = tuple.__new__
+        return lambda _cursor, fila: nueva(forma, fila)
+
+    @classmethod
+    def bind(cls, cursor):
+        """Instala el row factory del modelo en el cursor (después de execute) y lo devuelve."""
+        cursor.row_factory = cls.row_factory(cursor)
+        return cursor
+
+    @classmethod
+    def from_row(cls, row):
+        if row is None:
+            return None
+        columnas = tuple(row.keys())
+        return tuple.__new__(cls.shape(columnas), (row[c] for c in columnas))
+
+    def keys(self):
+        return self._fields
+
+    def __getitem__(self, clave):
+        if clave.__class__ is str:
+            try:
+                clave = self._index[clave]
+            except KeyError:
+                raise KeyError(clave) from None
+        return tuple.__getitem__(self, clave)
+
+    def get(self, clave, default=None):
+        i = self._index.get(clave)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def to_dict(self):
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{c}={v!r}' for c, v in zip(self._fields, self))})"
+
+    def __reduce__(self):
+        return (_reconstruir, (self._model, self._fields, tuple(self)))
+
+
+def _reconstruir(modelo, columnas, valores):
+    return tuple.__new__(modelo.shape(columnas), valores)
@@ -1,11 +1,14 @@
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import field
+from models.base import Model, ahora
 
-@dataclass
-class Sale:
+
+class Sale(Model):
+    """Venta (tabla sales)."""
+    __slots__ = ()
     id: int
     user_id: int
     product_id: int
     cantidad: int
-    precio_total: float
-    fecha: str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    total: float
+    # Se evalúa en cada construcción, no una sola vez al importar el módulo
+    fecha: str = field(default_factory=ahora)
@@ -1,15 +1,18 @@
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import field
+from models.base import Model, ahora
 
-@dataclass
-class Usuario:
+
+class Usuario(Model):
+    """Usuario (tabla users). Los servicios nunca seleccionan clave_hash para las respuestas."""
+    __slots__ = ()
     id: int
     nombres: str
     apellidos: str
     edad: int
-    correo: str
     telefono: str
+    correo: str
+    clave_hash: str
     ciudad: str
     pais: str
-    clave_hash: str
-    registro: str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Se evalúa en cada construcción, no una sola vez al importar el módulo
+    registro: str = field(default_factory=ahora)
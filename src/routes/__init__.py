@@ -1,5 +1,6 @@
 from routes.users_bp import usuarios_bp
 from routes.products_bp import productos_bp
 from routes.sales_bp import sales_bp
+from routes.jobs_bp import jobs_bp
 
-__all__ = ["usuarios_bp", "productos_bp", "sales_bp"]
+__all__ = ["usuarios_bp", "productos_bp", "sales_bp", "jobs_bp"]
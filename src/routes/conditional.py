@@ -0,0 +1,42 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import request, make_response
+
+# GET condicional: la versión (seq del registro de cambios) se consulta antes de leer las filas,
+# así un 304 no toca los datos ni serializa nada.
+
+
+def _etag(version):
+    # La misma versión con otros parámetros (filtros, página) es otra representación
+    clave = f"{request.full_path}|{version}".encode("utf-8")
+    return f"{version}-{hashlib.sha1(clave).hexdigest()[:16]}"
+
+
+def _fecha(fecha):
+    # CURRENT_TIMESTAMP de SQLite está en UTC con resolución de segundos
+    return datetime.strptime(fecha, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc) if fecha else None
+
+
+def respuesta_condicional(version, generar):
+    """
+    version: (seq, fecha) de change_service o None si el recurso no existe.
+    Devuelve 304 si el cliente ya tiene esta versión; si no, llama a generar() y le agrega ETag y Last-Modified.
+    """
+    if version is None:
+        return generar()
+    etag, modificado = _etag(version[0]), _fecha(version[1])
+    if request.if_none_match:
+        vigente = request.if_none_match.contains(etag)
+    else:
+        vigente = bool(modificado and request.if_modified_since and modificado <= request.if_modified_since)
+    if vigente:
+        respuesta = make_response("", 304)
+    else:
+        respuesta = make_response(generar())
+        if respuesta.status_code != 200:
+            return respuesta
+    respuesta.set_etag(etag)
+    if modificado:
+        respuesta.last_modified = modificado
+    respuesta.headers["Cache-Control"] = "private, no-cache"
+    return respuesta
@@ -0,0 +1,41 @@
+import os
+from flask import Blueprint, jsonify, send_file
+from service.job_service import get_job, get_job_file
+from flask_jwt_extended import jwt_required
+
+jobs_bp = Blueprint("jobs_bp", __name__)
+
+def respuesta_job(resultado):
+    """Respuesta estándar al encolar un trabajo: 202 con el id y la URL para consultar su estado."""
+    if not resultado["success"]:
+        return jsonify({"success": False, "message": resultado["message"]}), 400
+    job = resultado["data"]
+    return jsonify({"success": True, "message": "Trabajo en cola" if resultado["nuevo"] else "Trabajo ya en curso",
+                    "data": job, "estado_url": f"/api/jobs/{job['id']}"}), 202
+
+# Estado y progreso de un trabajo (el archivo se obtiene con /descarga)
+@jobs_bp.route("/jobs/<string:job_id>", methods=["GET"])
+@jwt_required()
+def estado_job(job_id):
+    try:
+        resultado = get_job(job_id)
+        if resultado["success"]:
+            return jsonify(resultado), 200
+        return jsonify(resultado), 404
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error al obtener el trabajo: {e}"}), 500
+
+# Descargar el archivo generado por un trabajo completado
+@jobs_bp.route("/jobs/<string:job_id>/descarga", methods=["GET"])
+@jwt_required()
+def descargar_job(job_id):
+    try:
+        resultado = get_job_file(job_id)
+        if not resultado["success"]:
+            return jsonify(resultado), 404
+        job = resultado["data"]
+        if job["estado"] != "completado" or not job["path"] or not os.path.exists(job["path"]):
+            return jsonify({"success": False, "message": f"El trabajo no tiene archivo disponible (estado: {job['estado']})"}), 409
+        return send_file(job["path"], as_attachment=True)
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error al descargar el resultado: {e}"}), 500
@@ -1,25 +1,19 @@
-from flask import Blueprint, request, jsonify, Response
-from service.product_service import create_product, get_products, get_product_by_id, update_product, delete_product
-from exports.export_products import export_products
-from bs4 import BeautifulSoup
+from flask import Blueprint, request, jsonify
+from service.product_service import create_product, get_products, stream_products, search_products, get_product_by_id, update_product, delete_product
+from service.pagination import page_args
+from routes.streaming import modo_streaming, respuesta_streaming, respuesta_descarga, flag
+from service.job_service import submit_job
+from service.product_cache import product_cache
+from service.change_service import table_version
+from routes.conditional import respuesta_condicional
+from routes.jobs_bp import respuesta_job
+from exports.stream_writer import formato_no_soportado
+from routes.serializer import proyector, respuesta_json, campos_pedidos, CAMPOS_PRODUCTO
+from service.projection import InvalidFields
 from flask_jwt_extended import jwt_required
-import requests
-import json
-from collections import OrderedDict
 
 productos_bp = Blueprint("productos_bp", __name__)
 
-def formatear_producto(producto):
-    return OrderedDict([
-        ("id", producto.get("id")),
-        ("nombre", producto.get("nombre")),
-        ("descripcion", producto.get("descripcion")),
-        ("precio", producto.get("precio")),
-        ("categoria", producto.get("categoria")),
-        ("stock", producto.get("stock")),
-        ("registro", producto.get("registro"))
-    ])
-
 @productos_bp.route("/productos", methods=["POST"])
 @jwt_required()
 def crear_producto():
@@ -52,23 +46,78 @@ def listar_productos():
     try:
         nombre = request.args.get("nombre")
         categoria = request.args.get("categoria")
-        resultado = get_products(nombre, categoria)
-        if resultado["success"]:
-            productos_formateados = [formatear_producto(p) for p in resultado["data"]]
-            return Response(json.dumps({"success": True, "data": productos_formateados}, indent=2), mimetype="application/json")
-        return jsonify({"success": False, "message": "Error al listar productos"}), 400
+        limit, after = page_args(request.args)
+        modo = modo_streaming(request.args)
+        # ?fields=id,nombre,precio: solo esas columnas se leen de la base y se serializan
+        campos = campos_pedidos(request.args, CAMPOS_PRODUCTO)
+        formatear = proyector(campos)
+
+        def generar():
+            if modo:
+                resultado = stream_products(nombre, categoria, after=after, campos=campos)
+                if resultado["success"]:
+                    return respuesta_streaming(resultado["data"], formatear, modo)
+                return jsonify({"success": False, "message": resultado.get("message", "Error al listar productos")}), 400
+            resultado = get_products(nombre, categoria, limit=limit, after=after, campos=campos)
+            if resultado["success"]:
+                productos_formateados = [formatear(p) for p in resultado["data"]]
+                return respuesta_json({"success": True, "data": productos_formateados, "limit": limit,
+                                       "next_cursor": resultado["next_cursor"]}, pretty=flag(request.args, "pretty"))
+            return jsonify({"success": False, "message": resultado.get("message", "Error al listar productos")}), 400
+
+        # Cualquier cambio en productos cambia la versión del listado
+        return respuesta_condicional(table_version("productos"), generar)
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al listar productos: {e}"}), 500
 
 
+@productos_bp.route("/productos/buscar", methods=["GET"])
+@jwt_required()
+def buscar_productos():
+    try:
+        texto = request.args.get("q", "").strip()
+        if not texto:
+            return jsonify({"success": False, "message": "Falta el parámetro q"}), 400
+        limit, _ = page_args(request.args)
+        campos = campos_pedidos(request.args, CAMPOS_PRODUCTO)
+        resultado = search_products(texto, limit=limit, campos=campos)
+        if resultado["success"]:
+            formatear = proyector(campos)
+            productos_formateados = [formatear(p) for p in resultado["data"]]
+            return respuesta_json({"success": True, "data": productos_formateados, "limit": limit})
+        return jsonify({"success": False, "message": resultado.get("message", "Error al buscar productos")}), 400
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error inesperado al buscar productos: {e}"}), 500
+
+
+# Estadísticas de la caché de productos de este proceso
+@productos_bp.route("/productos/cache", methods=["GET"])
+@jwt_required()
+def estadisticas_cache_productos():
+    return jsonify({"success": True, "data": product_cache.stats()}), 200
+
+
 @productos_bp.route("/productos/<int:product_id>", methods=["GET"])
 @jwt_required()
 def producto_por_id(product_id):
     try:
+        # La fila completa y su versión vienen de la caché; ?fields= solo recorta la salida
+        formatear = proyector(campos_pedidos(request.args, CAMPOS_PRODUCTO))
         resultado = get_product_by_id(product_id)
-        if resultado["success"]:
-            return Response(json.dumps({"success": True, "data": formatear_producto(resultado["data"])}, indent=2), mimetype="application/json")
-        return jsonify({"success": False, "message": "Producto no encontrado"}), 404
+
+        def generar():
+            if resultado["success"]:
+                return respuesta_json({"success": True, "data": formatear(resultado["data"])},
+                                      pretty=flag(request.args, "pretty"))
+            return jsonify({"success": False, "message": "Producto no encontrado"}), 404
+
+        return respuesta_condicional(resultado.get("version"), generar)
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al obtener producto: {e}"}), 500
 
@@ -113,10 +162,21 @@ def eliminar_producto(product_id):
 def exportar_productos():
     try:
         formato = request.args.get("formato", "json").lower()
-        productos = get_products()["data"]
-        resultado = export_products(productos, formato)
-        status = 200 if resultado["success"] else 400
-        return jsonify(resultado), status
+        comprimir = flag(request.args, "gzip")
+        # ?incremental=1: solo los cambios desde la última exportación incremental (siempre como trabajo,
+        # así la marca de agua avanza únicamente cuando el archivo quedó escrito)
+        incremental = flag(request.args, "incremental")
+        error = formato_no_soportado(formato)
+        if error:
+            return jsonify({"success": False, "message": error}), 400
+        # ?descarga=1 envía el archivo al cliente; si no, se genera en segundo plano (ver /api/jobs/<id>)
+        if flag(request.args, "descarga") and not incremental:
+            resultado = stream_products()
+            if not resultado["success"]:
+                return jsonify(resultado), 400
+            respuesta = respuesta_descarga(resultado["data"], "productos_export", formato, comprimir=comprimir)
+            return respuesta or (jsonify({"success": False, "message": "No hay productos para exportar"}), 400)
+        return respuesta_job(submit_job("exportar_productos", {"formato": formato, "gzip": comprimir, "incremental": incremental}))
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al exportar productos: {e}"}), 500
 
@@ -125,13 +185,20 @@ def exportar_productos():
 @jwt_required()
 def productos_por_nombre(nombre):
     try:
-        resultado = get_products(nombre=nombre)
+        limit, after = page_args(request.args)
+        campos = campos_pedidos(request.args, CAMPOS_PRODUCTO)
+        resultado = get_products(nombre=nombre, limit=limit, after=after, campos=campos)
         if resultado["success"]:
             if not resultado["data"]:
-                return jsonify({"success": True, "message": "No se encontraron productos con ese nombre", "data": []}), 200
-            productos_formateados = [formatear_producto(p) for p in resultado["data"]]
-            return jsonify({"success": True, "data": productos_formateados}), 200
-        return jsonify({"success": False, "message": "Error al buscar productos por nombre"}), 400
+                return jsonify({"success": True, "message": "No se encontraron productos con ese nombre", "data": [],
+                                "limit": limit, "next_cursor": None}), 200
+            formatear = proyector(campos)
+            productos_formateados = [formatear(p) for p in resultado["data"]]
+            return respuesta_json({"success": True, "data": productos_formateados, "limit": limit,
+                                   "next_cursor": resultado["next_cursor"]})
+        return jsonify({"success": False, "message": resultado.get("message", "Error al buscar productos por nombre")}), 400
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": f"Error al buscar productos por nombre: {e}"}), 500
 
@@ -139,13 +206,20 @@ def productos_por_nombre(nombre):
 @jwt_required()
 def productos_por_categoria(categoria):
     try:
-        resultado = get_products(categoria=categoria)
+        limit, after = page_args(request.args)
+        campos = campos_pedidos(request.args, CAMPOS_PRODUCTO)
+        resultado = get_products(categoria=categoria, limit=limit, after=after, campos=campos)
         if resultado["success"]:
             if not resultado["data"]:
-                return jsonify({"success": True, "message": "No se encontraron productos en esta categoría", "data": []}), 200
-            productos_formateados = [formatear_producto(p) for p in resultado["data"]]
-            return jsonify({"success": True, "data": productos_formateados}), 200
-        return jsonify({"success": False, "message": "Error al buscar productos por categoría"}), 400
+                return jsonify({"success": True, "message": "No se encontraron productos en esta categoría", "data": [],
+                                "limit": limit, "next_cursor": None}), 200
+            formatear = proyector(campos)
+            productos_formateados = [formatear(p) for p in resultado["data"]]
+            return respuesta_json({"success": True, "data": productos_formateados, "limit": limit,
+                                   "next_cursor": resultado["next_cursor"]})
+        return jsonify({"success": False, "message": resultado.get("message", "Error al buscar productos por categoría")}), 400
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": f"Error al buscar productos por categoría: {e}"}), 500
 
@@ -157,40 +231,40 @@ def importar_productos():
     """
     Extrae productos desde una web pública de prueba (sin autenticación)
     y los inserta en la base de datos.
+    Body opcional: {"urls": [...]} con páginas de producto, o {"url": listado, "paginas": N, "categoria": ...}.
     """
     try:
-        url = "https://webscraper.io/test-sites/e-commerce/static/computers/laptops"
-        page = requests.get(url, timeout=10)
-        soup = BeautifulSoup(page.text, "html.parser")
-
-        productos_extraidos = []
-        items = soup.select(".thumbnail")
-
-        for item in items:
-            nombre = item.select_one(".title").get_text(strip=True)
-            descripcion = item.select_one(".description").get_text(strip=True)
-            precio = float(item.select_one(".price").get_text(strip=True).replace("$", ""))
-            categoria = "Laptops"
-            stock = 10  # valor por defecto
-
-            resultado = create_product(
-                nombre=nombre,
-                descripcion=descripcion,
-                precio=precio,
-                categoria=categoria,
-                stock=stock
-            )
+        data = request.get_json(silent=True) or {}
+        urls = data.get("urls")
+        if urls is not None and not (isinstance(urls, list) and all(isinstance(u, str) for u in urls)):
+            return jsonify({"success": False, "message": "urls debe ser una lista de cadenas"}), 400
+        try:
+            paginas = int(data.get("paginas", 1))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "message": "paginas debe ser un entero"}), 400
 
-            if resultado["success"]:
-                productos_extraidos.append(nombre)
+        # requests y bs4 se cargan con la primera importación, no al arrancar cada worker
+        from service.scraper_service import import_products
+        resultado = import_products(
+            urls=urls,
+            listing_url=data.get("url"),
+            paginas=paginas,
+            categoria=data.get("categoria", "Laptops")
+        )
+        if not resultado["success"]:
+            return jsonify({"success": False, "message": resultado["message"], "errores": resultado["errores"]}), \
+                resultado.get("status", 400)
 
-        if not productos_extraidos:
-            return jsonify({"success": False, "message": "No se importaron nuevos productos (posiblemente duplicados)."}), 200
+        if not resultado["insertados"]:
+            return jsonify({"success": False, "message": "No se importaron nuevos productos (posiblemente duplicados).",
+                            "actualizados": resultado["actualizados"], "errores": resultado["errores"]}), 200
 
         return jsonify({
             "success": True,
-            "message": f"{len(productos_extraidos)} productos importados exitosamente.",
-            "productos": productos_extraidos
+            "message": f"{resultado['insertados']} productos importados exitosamente.",
+            "actualizados": resultado["actualizados"],
+            "productos": resultado["productos"],
+            "errores": resultado["errores"]
         }), 201
 
     except Exception as e:
@@ -1,26 +1,23 @@
 from flask import Blueprint, request, jsonify
-from service.sales_services import create_sale, get_sales, get_sale_by_id, update_sale, delete_sale
-from service.product_service import get_product_by_id, update_product
-from exports.export_sales import export_sales
+from service.sales_services import create_sale, create_sales_batch, get_sales, stream_sales, get_sale_by_id, update_sale, delete_sale
+from service.pagination import page_args
+from routes.streaming import modo_streaming, respuesta_streaming, respuesta_descarga, flag
+from exports.stream_writer import formato_no_soportado
+from service.job_service import submit_job
+from service.change_service import table_version
+from routes.conditional import respuesta_condicional
+from routes.jobs_bp import respuesta_job
+from service.rollup_service import get_rollup
+from service.analytics_service import revenue_by, sale_percentiles, moving_average, cohort_retention
+from routes.serializer import proyector, respuesta_json, campos_pedidos, CAMPOS_VENTA
+from service.projection import InvalidFields
 from flask_jwt_extended import jwt_required
-from collections import OrderedDict
 from datetime import datetime
-import os
-from openpyxl import Workbook
-from openpyxl.chart import BarChart, Reference
 
 sales_bp = Blueprint("sales_bp", __name__)
 
 # Formatear venta para la respuesta
-def formatear_venta(venta):
-    return OrderedDict([
-        ("id", venta.get("id")),
-        ("user_id", venta.get("user_id")),
-        ("product_id", venta.get("product_id")),
-        ("cantidad", venta.get("cantidad")),
-        ("total", venta.get("total")),
-        ("fecha", venta.get("fecha"))
-    ])
+formatear_venta = proyector(CAMPOS_VENTA)
 
 # -------------------- CREAR VENTA --------------------
 @sales_bp.route("/ventas", methods=["POST"])
@@ -33,32 +30,40 @@ def crear_venta():
             if field not in data or data[field] is None:
                 return jsonify({"success": False, "message": f"Falta el campo {field}"}), 400
 
-        # Obtener producto
-        product_res = get_product_by_id(data["product_id"])
-        if not product_res["success"]:
-            return jsonify({"success": False, "message": "Producto no encontrado"}), 404
-        producto = product_res["data"]
-
-        # Validar stock
-        if producto["stock"] < data["cantidad"]:
-            return jsonify({"success": False, "message": "Stock insuficiente"}), 400
-
-        total_venta = producto["precio"] * data["cantidad"]
-
-        # Crear venta
-        resultado = create_sale(data["user_id"], data["product_id"], data["cantidad"], total_venta)
+        resultado = create_sale(data["user_id"], data["product_id"], data["cantidad"])
 
         if resultado["success"]:
-            # Actualizar stock
-            update_product(producto["id"], stock=producto["stock"] - data["cantidad"])
             return jsonify({"success": True, "message": "Venta registrada correctamente",
                             "data": formatear_venta(resultado["data"])}), 201
 
-        return jsonify({"success": False, "message": resultado.get("message", "Error al crear venta")}), 400
+        return jsonify({"success": False, "message": resultado.get("message", "Error al crear venta")}), resultado.get("status", 400)
 
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al crear venta: {e}"}), 500
 
+# -------------------- CREAR VENTAS EN LOTE --------------------
+@sales_bp.route("/ventas/lote", methods=["POST"])
+@jwt_required()
+def crear_ventas_lote():
+    try:
+        data = request.json
+        lineas = data.get("lineas") if isinstance(data, dict) else data
+        if not isinstance(lineas, list):
+            return jsonify({"success": False, "message": "Se esperaba una lista de líneas de venta"}), 400
+
+        resultado = create_sales_batch(lineas)
+        if resultado["success"]:
+            for linea in resultado["lineas"]:
+                linea["data"] = formatear_venta(linea["data"])
+            return jsonify({"success": True, "message": f"{len(lineas)} ventas registradas correctamente",
+                            "lineas": resultado["lineas"]}), 201
+
+        return jsonify({"success": False, "message": resultado.get("message", "Error al crear ventas"),
+                        "lineas": resultado.get("lineas", [])}), resultado.get("status", 400)
+
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error inesperado al crear ventas en lote: {e}"}), 500
+
 # -------------------- LISTAR VENTAS --------------------
 @sales_bp.route("/ventas", methods=["GET"])
 @jwt_required()
@@ -66,14 +71,26 @@ def listar_ventas():
     try:
         user_id = request.args.get("user_id", type=int)
         product_id = request.args.get("product_id", type=int)
-        resultado = get_sales(user_id=user_id, product_id=product_id)
+        limit, after = page_args(request.args)
+        modo = modo_streaming(request.args)
+        campos = campos_pedidos(request.args, CAMPOS_VENTA)
+        formatear = proyector(campos)
+        if modo:
+            resultado = stream_sales(user_id=user_id, product_id=product_id, after=after, campos=campos)
+            if resultado["success"]:
+                return respuesta_streaming(resultado["data"], formatear, modo)
+            return jsonify({"success": False, "message": resultado.get("message", "Error al listar ventas")}), 400
+        resultado = get_sales(user_id=user_id, product_id=product_id, limit=limit, after=after, campos=campos)
 
         if resultado["success"]:
-            ventas_formateadas = [formatear_venta(v) for v in resultado["data"]]
-            return jsonify({"success": True, "data": ventas_formateadas}), 200
+            ventas_formateadas = [formatear(v) for v in resultado["data"]]
+            return respuesta_json({"success": True, "data": ventas_formateadas, "limit": limit,
+                                   "next_cursor": resultado["next_cursor"]})
 
-        return jsonify({"success": False, "message": "Error al listar ventas"}), 400
+        return jsonify({"success": False, "message": resultado.get("message", "Error al listar ventas")}), 400
 
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al listar ventas: {e}"}), 500
 
@@ -82,10 +99,13 @@ def listar_ventas():
 @jwt_required()
 def venta_por_id(sale_id):
     try:
-        resultado = get_sale_by_id(sale_id)
+        campos = campos_pedidos(request.args, CAMPOS_VENTA)
+        resultado = get_sale_by_id(sale_id, campos)
         if resultado["success"]:
-            return jsonify({"success": True, "data": formatear_venta(resultado["data"])}), 200
+            return respuesta_json({"success": True, "data": proyector(campos)(resultado["data"])})
         return jsonify({"success": False, "message": "Venta no encontrada"}), 404
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al obtener venta: {e}"}), 500
 
@@ -95,30 +115,13 @@ def venta_por_id(sale_id):
 def actualizar_venta(sale_id):
     try:
         data = request.json
-        venta_res = get_sale_by_id(sale_id)
-        if not venta_res["success"]:
-            return jsonify({"success": False, "message": "Venta no encontrada"}), 404
-
-        venta = venta_res["data"]
-        producto_res = get_product_by_id(venta["product_id"])
-        if not producto_res["success"]:
-            return jsonify({"success": False, "message": "Producto de la venta no encontrado"}), 404
-        producto = producto_res["data"]
-
-        nueva_cantidad = data.get("cantidad", venta["cantidad"])
-        ajuste_stock = producto["stock"] + venta["cantidad"] - nueva_cantidad
-        if ajuste_stock < 0:
-            return jsonify({"success": False, "message": "Stock insuficiente para la actualización"}), 400
-
-        total = data.get("total", producto["precio"] * nueva_cantidad)
-        resultado = update_sale(sale_id, cantidad=nueva_cantidad, total=total)
+        resultado = update_sale(sale_id, cantidad=data.get("cantidad"), total=data.get("total"))
 
         if resultado["success"]:
-            update_product(producto["id"], stock=ajuste_stock)
             return jsonify({"success": True, "message": "Venta actualizada correctamente",
-                            "data": formatear_venta(get_sale_by_id(sale_id)["data"])}), 200
+                            "data": formatear_venta(resultado["data"])}), 200
 
-        return jsonify({"success": False, "message": resultado.get("message", "Error al actualizar venta")}), 400
+        return jsonify({"success": False, "message": resultado.get("message", "Error al actualizar venta")}), resultado.get("status", 400)
 
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al actualizar venta: {e}"}), 500
@@ -128,18 +131,8 @@ def actualizar_venta(sale_id):
 @jwt_required()
 def eliminar_venta(sale_id):
     try:
-        venta_res = get_sale_by_id(sale_id)
-        if not venta_res["success"]:
-            return jsonify({"success": False, "message": "Venta no encontrada"}), 404
-        venta = venta_res["data"]
-
-        producto_res = get_product_by_id(venta["product_id"])
-        if producto_res["success"]:
-            producto = producto_res["data"]
-            update_product(producto["id"], stock=producto["stock"] + venta["cantidad"])
-
         resultado = delete_sale(sale_id)
-        status = 200 if resultado["success"] else 404
+        status = 200 if resultado["success"] else resultado.pop("status", 400)
         return jsonify(resultado), status
 
     except Exception as e:
@@ -151,10 +144,20 @@ def eliminar_venta(sale_id):
 def exportar_ventas():
     try:
         formato = request.args.get("formato", "json").lower()
-        ventas = get_sales()["data"]
-        resultado = export_sales(ventas, formato)
-        status = 200 if resultado["success"] else 400
-        return jsonify(resultado), status
+        comprimir = flag(request.args, "gzip")
+        # ?incremental=1: solo los cambios desde la última exportación incremental (siempre como trabajo,
+        # así la marca de agua avanza únicamente cuando el archivo quedó escrito)
+        incremental = flag(request.args, "incremental")
+        error = formato_no_soportado(formato)
+        if error:
+            return jsonify({"success": False, "message": error}), 400
+        if flag(request.args, "descarga") and not incremental:
+            resultado = stream_sales()
+            if not resultado["success"]:
+                return jsonify(resultado), 400
+            respuesta = respuesta_descarga(resultado["data"], "ventas", formato, comprimir=comprimir)
+            return respuesta or (jsonify({"success": False, "message": "No hay ventas para exportar."}), 400)
+        return respuesta_job(submit_job("exportar_ventas", {"formato": formato, "gzip": comprimir, "incremental": incremental}))
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al exportar ventas: {e}"}), 500
 
@@ -168,49 +171,101 @@ def reporte_mensual():
         if not mes or mes < 1 or mes > 12:
             return jsonify({"success": False, "message": "Mes inválido"}), 400
 
-        ventas = get_sales()["data"]
-        ventas_mes = [v for v in ventas if datetime.fromisoformat(v["fecha"]).month == mes
-                      and datetime.fromisoformat(v["fecha"]).year == año]
+        return respuesta_job(submit_job("reporte_mensual", {"mes": mes, "año": año}))
 
-        if not ventas_mes:
-            return jsonify({"success": False, "message": "No hay ventas en ese mes"}), 404
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error al generar reporte mensual: {e}"}), 500
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = f"Ventas {mes}-{año}"
-        ws.append(["ID Venta", "Usuario", "Producto", "Cantidad", "Total", "Fecha"])
-        for v in ventas_mes:
-            ws.append([v["id"], v["user_id"], v["product_id"], v["cantidad"], v["total"], v["fecha"]])
+# -------------------- RESUMEN (ROLLUPS) --------------------
+@sales_bp.route("/ventas/resumen/<string:dimension>", methods=["GET"])
+@jwt_required()
+def resumen_ventas(dimension):
+    try:
+        resultado = get_rollup(
+            dimension,
+            desde=request.args.get("desde"),
+            hasta=request.args.get("hasta"),
+            orden=request.args.get("orden", "clave"),
+            limit=request.args.get("limit", type=int)
+        )
+        if resultado["success"]:
+            return jsonify({"success": True, "dimension": dimension, "data": resultado["data"]}), 200
+        return jsonify({"success": False, "message": resultado["message"]}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error al obtener resumen de ventas: {e}"}), 500
 
-        chart = BarChart()
-        data = Reference(ws, min_col=5, min_row=1, max_row=len(ventas_mes)+1)
-        cats = Reference(ws, min_col=1, min_row=2, max_row=len(ventas_mes)+1)
-        chart.add_data(data, titles_from_data=True)
-        chart.set_categories(cats)
-        chart.title = "Ventas Totales"
-        ws.add_chart(chart, "H2")
+# -------------------- ANALÍTICA --------------------
+def _respuesta_analitica(resultado):
+    if resultado["success"]:
+        return jsonify(resultado), 200
+    return jsonify({"success": False, "message": resultado["message"]}), resultado.get("status", 400)
 
-        os.makedirs("exports", exist_ok=True)
-        path = f"exports/reporte_ventas_{mes}_{año}.xlsx"
-        wb.save(path)
+@sales_bp.route("/ventas/analitica/ingresos", methods=["GET"])
+@jwt_required()
+def analitica_ingresos():
+    try:
+        por = request.args.get("por", "producto")
+        return _respuesta_analitica(revenue_by(por, request.args.get("desde"), request.args.get("hasta")))
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error en analítica de ingresos: {e}"}), 500
 
-        return jsonify({"success": True, "message": f"Reporte generado: {path}"}), 200
+@sales_bp.route("/ventas/analitica/percentiles", methods=["GET"])
+@jwt_required()
+def analitica_percentiles():
+    try:
+        campo = request.args.get("campo", "total")
+        texto = request.args.get("p", "50,90,95,99")
+        try:
+            percentiles = [float(p) for p in texto.split(",") if p.strip()]
+        except ValueError:
+            return jsonify({"success": False, "message": "Percentiles inválidos"}), 400
+        if not percentiles or any(p < 0 or p > 100 for p in percentiles):
+            return jsonify({"success": False, "message": "Los percentiles deben estar entre 0 y 100"}), 400
+        return _respuesta_analitica(sale_percentiles(campo, percentiles, request.args.get("desde"), request.args.get("hasta")))
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error en analítica de percentiles: {e}"}), 500
 
+@sales_bp.route("/ventas/analitica/media_movil", methods=["GET"])
+@jwt_required()
+def analitica_media_movil():
+    try:
+        ventana = request.args.get("ventana", 7, type=int)
+        return _respuesta_analitica(moving_average(ventana, request.args.get("desde"), request.args.get("hasta")))
     except Exception as e:
-        return jsonify({"success": False, "message": f"Error al generar reporte mensual: {e}"}), 500
+        return jsonify({"success": False, "message": f"Error en analítica de media móvil: {e}"}), 500
+
+@sales_bp.route("/ventas/analitica/cohortes", methods=["GET"])
+@jwt_required()
+def analitica_cohortes():
+    try:
+        return _respuesta_analitica(cohort_retention(request.args.get("desde"), request.args.get("hasta")))
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error en analítica de cohortes: {e}"}), 500
 
 # -------------------- VENTAS POR USUARIO --------------------
 @sales_bp.route("/ventas/usuario/<int:user_id>", methods=["GET"])
 @jwt_required()
 def ventas_por_usuario(user_id):
     try:
-        resultado = get_sales(user_id=user_id)
-        if resultado["success"]:
-            if not resultado["data"]:
-                return jsonify({"success": True, "message": "No hay ventas para este usuario", "data": []}), 200
-            ventas_formateadas = [formatear_venta(v) for v in resultado["data"]]
-            return jsonify({"success": True, "data": ventas_formateadas}), 200
-        return jsonify({"success": False, "message": "Error al obtener ventas por usuario"}), 400
+        limit, after = page_args(request.args)
+        campos = campos_pedidos(request.args, CAMPOS_VENTA)
+
+        def generar():
+            resultado = get_sales(user_id=user_id, limit=limit, after=after, campos=campos)
+            if resultado["success"]:
+                if not resultado["data"]:
+                    return jsonify({"success": True, "message": "No hay ventas para este usuario", "data": [],
+                                    "limit": limit, "next_cursor": None}), 200
+                formatear = proyector(campos)
+                ventas_formateadas = [formatear(v) for v in resultado["data"]]
+                return respuesta_json({"success": True, "data": ventas_formateadas, "limit": limit,
+                                       "next_cursor": resultado["next_cursor"]})
+            return jsonify({"success": False, "message": resultado.get("message", "Error al obtener ventas por usuario")}), 400
+
+        # Las ventas borradas no dejan su user_id en el registro de cambios: se versiona con toda la tabla
+        return respuesta_condicional(table_version("sales"), generar)
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": f"Error al obtener ventas por usuario: {e}"}), 500
 
@@ -219,12 +274,19 @@ def ventas_por_usuario(user_id):
 @jwt_required()
 def ventas_por_producto(product_id):
     try:
-        resultado = get_sales(product_id=product_id)
+        limit, after = page_args(request.args)
+        campos = campos_pedidos(request.args, CAMPOS_VENTA)
+        resultado = get_sales(product_id=product_id, limit=limit, after=after, campos=campos)
         if resultado["success"]:
             if not resultado["data"]:
-                return jsonify({"success": True, "message": "No hay ventas para este producto", "data": []}), 200
-            ventas_formateadas = [formatear_venta(v) for v in resultado["data"]]
-            return jsonify({"success": True, "data": ventas_formateadas}), 200
-        return jsonify({"success": False, "message": "Error al obtener ventas por producto"}), 400
+                return jsonify({"success": True, "message": "No hay ventas para este producto", "data": [],
+                                "limit": limit, "next_cursor": None}), 200
+            formatear = proyector(campos)
+            ventas_formateadas = [formatear(v) for v in resultado["data"]]
+            return respuesta_json({"success": True, "data": ventas_formateadas, "limit": limit,
+                                   "next_cursor": resultado["next_cursor"]})
+        return jsonify({"success": False, "message": resultado.get("message", "Error al obtener ventas por producto")}), 400
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": f"Error al obtener ventas por producto: {e}"}), 500
@@ -0,0 +1,98 @@
+import json
+from operator import itemgetter
+from flask import Response
+from models import Model
+from service.projection import InvalidFields
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional: sin orjson se usa json de la biblioteca estándar
+    orjson = None
+
+# Serialización compartida de las respuestas: cada fila (sqlite3.Row, dict o tupla del cursor) se
+# proyecta directamente al orden de campos de salida y se codifica en JSON compacto.
+
+CAMPOS_PRODUCTO = ("id", "nombre", "descripcion", "precio", "categoria", "stock", "registro")
+CAMPOS_VENTA = ("id", "user_id", "product_id", "cantidad", "total", "fecha")
+CAMPOS_USUARIO = ("id", "nombres", "apellidos", "edad", "correo", "telefono", "ciudad", "pais")
+
+
+def proyector(campos, columnas=None):
+    """
+    Devuelve una función fila -> dict con solo `campos`, en ese orden.
+    Con `columnas` (nombres de cursor.description) la fila puede ser una tupla plana del cursor.
+    Los modelos se leen por posición según su forma, sin pasar por su __getitem__ por nombre.
+    """
+    campos = tuple(campos)
+    if columnas is not None:
+        return _por_posicion(campos, [columnas.index(c) for c in campos])
+    por_clave = _por_posicion(campos, campos)
+    lectores = {}
+
+    def proyectar(fila):
+        lector = lectores.get(fila.__class__)
+        if lector is None:
+            lector = lectores.setdefault(fila.__class__, _lector_modelo(fila.__class__, campos) or por_clave)
+        return lector(fila)
+    return proyectar
+
+
+def _por_posicion(campos, claves):
+    getter = itemgetter(*claves)
+    if len(campos) == 1:  # itemgetter con una sola clave devuelve el valor, no una tupla
+        return lambda fila: {campos[0]: getter(fila)}
+    return lambda fila: dict(zip(campos, getter(fila)))
+
+
+def _lector_modelo(tipo, campos):
+    if not issubclass(tipo, Model) or any(c not in tipo._index for c in campos):
+        return None
+    if tipo._fields[:len(campos)] == campos:  # mismo orden: basta con recorrer la tupla
+        return lambda fila: dict(zip(campos, fila))
+    por_posicion = _por_posicion(campos, [tipo._index[c] for c in campos])
+    return lambda fila: por_posicion(tuple(fila))
+
+
+def _a_dict(obj):
+    if isinstance(obj, Model):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} no es serializable a JSON")
+
+
+def dumps(obj, pretty=False):
+    """JSON en bytes; compacto salvo pretty=True. Los modelos se serializan como objetos."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_a_dict, option=orjson.OPT_INDENT_2 if pretty else 0)
+    # json serializaría un modelo (tupla) como lista: se convierten antes de codificar
+    obj = _sin_modelos(obj)
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _sin_modelos(obj):
+    if isinstance(obj, Model):
+        return obj.to_dict()
+    if isinstance(obj, dict):
+        return {k: _sin_modelos(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_sin_modelos(v) for v in obj]
+    return obj
+
+
+def respuesta_json(payload, status=200, pretty=False):
+    return Response(dumps(payload, pretty), status=status, mimetype="application/json")
+
+
+def campos_pedidos(args, permitidos):
+    """
+    Campos de ?fields=a,b,c en el orden pedido; sin el parámetro, todos los `permitidos` de la ruta.
+    Lanza InvalidFields si se pide alguno que la ruta no expone.
+    """
+    pedidos = [c.strip() for c in args.get("fields", "").split(",") if c.strip()]
+    if not pedidos:
+        return tuple(permitidos)
+    desconocidos = [c for c in pedidos if c not in permitidos]
+    if desconocidos:
+        raise InvalidFields(f"Campos desconocidos: {', '.join(desconocidos)}")
+    return tuple(dict.fromkeys(pedidos))
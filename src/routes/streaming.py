@@ -0,0 +1,56 @@
+from flask import Response
+from routes.serializer import dumps
+from exports.stream_writer import formato_no_soportado, peek, iter_export, export_filename, export_mimetype
+
+# Respuestas en streaming para colecciones grandes: ?stream=json (arreglo JSON) o ?stream=ndjson
+MODOS_STREAMING = ("json", "ndjson")
+
+
+def modo_streaming(args):
+    modo = (args.get("stream") or "").lower()
+    return modo if modo in MODOS_STREAMING else None
+
+
+def _json_array(chunks, formatear):
+    yield b'{"success":true,"data":['
+    primero = True
+    for filas in chunks:
+        bloque = b",".join(dumps(formatear(fila)) for fila in filas)
+        yield bloque if primero else b"," + bloque
+        primero = False
+    yield b"]}"
+
+
+def _ndjson(chunks, formatear):
+    for filas in chunks:
+        yield b"".join(dumps(formatear(fila)) + b"\n" for fila in filas)
+
+
+def respuesta_streaming(chunks, formatear, modo):
+    """Serializa cada bloque de filas a medida que sale del cursor, sin armar la lista completa."""
+    if modo == "ndjson":
+        return Response(_ndjson(chunks, formatear), mimetype="application/x-ndjson")
+    return Response(_json_array(chunks, formatear), mimetype="application/json")
+
+
+def flag(args, nombre):
+    return (args.get(nombre) or "").lower() in ("1", "true", "si", "sí")
+
+
+def respuesta_descarga(chunks, nombre, formato, columnas=None, comprimir=False):
+    """
+    Envía la exportación como archivo adjunto a medida que se lee el cursor.
+    Devuelve None si no hay filas, para que la ruta responda con su propio mensaje.
+    """
+    error = formato_no_soportado(formato)
+    if error:
+        raise ValueError(error)
+    primero, chunks = peek(chunks)
+    if primero is None:
+        return None
+    archivo = export_filename(nombre, formato, comprimir)
+    return Response(
+        iter_export(chunks, formato, columnas, comprimir),
+        mimetype=export_mimetype(formato, comprimir),
+        headers={"Content-Disposition": f'attachment; filename="{archivo}"'},
+    )
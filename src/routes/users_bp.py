@@ -1,25 +1,18 @@
 from flask import Blueprint, request, jsonify
-from service.user_service import create_user, verify_user, get_users, get_user_by_id, update_user, delete_user
-from exports.export_users import export_users
+from service.user_service import create_user, verify_user, get_users, stream_users, get_user_by_id, update_user, delete_user
+from service.pagination import page_args
+from routes.streaming import modo_streaming, respuesta_streaming, respuesta_descarga, flag
+from exports.stream_writer import formato_no_soportado
+from exports.export_users import COLUMNAS_USUARIO
+from service.job_service import submit_job
+from routes.jobs_bp import respuesta_job
 from flask_jwt_extended import create_access_token, get_jwt, jwt_required
-from collections import OrderedDict
+from routes.serializer import proyector, respuesta_json, campos_pedidos, CAMPOS_USUARIO
+from service.projection import InvalidFields
 from service.auth_services import BLACKLIST
 
 usuarios_bp = Blueprint("usuarios_bp", __name__)
 
-# Formatear usuario para salida JSON (sin clave_hash)
-def formatear_usuario(usuario):
-    return OrderedDict([
-        ("id", usuario.get("id")),
-        ("nombres", usuario.get("nombres")),
-        ("apellidos", usuario.get("apellidos")),
-        ("edad", usuario.get("edad")),
-        ("correo", usuario.get("correo")),
-        ("telefono", usuario.get("telefono")),
-        ("ciudad", usuario.get("ciudad")),
-        ("pais", usuario.get("pais"))
-    ])
-
 # Registro de usuario
 @usuarios_bp.route("/registro", methods=["POST"])
 def registro():
@@ -44,7 +37,7 @@ def registro():
         if resultado["success"]:
             return jsonify({"success": True, "message": "Usuario creado correctamente."}), 201
         else:
-            return jsonify({"success": False, "message": resultado.get("message", "Correo o teléfono duplicado")}), 409
+            return jsonify({"success": False, "message": resultado.get("message", "Correo o teléfono duplicado")}), resultado.get("status", 409)
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado en registro: {e}"}), 500
 
@@ -72,7 +65,7 @@ def login():
                 "token": access_token
             }), 200
         else:
-            return jsonify({"success": False, "message": resultado["message"]}), 401
+            return jsonify({"success": False, "message": resultado["message"]}), resultado.get("status", 401)
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado en login: {e}"}), 500
 
@@ -86,12 +79,24 @@ def listar_usuarios():
         edad_min = request.args.get("edad_min", type=int)
         edad_max = request.args.get("edad_max", type=int)
         correo = request.args.get("correo")
-
-        resultado = get_users(pais, ciudad, edad_min, edad_max, correo)
+        limit, after = page_args(request.args)
+        modo = modo_streaming(request.args)
+        campos = campos_pedidos(request.args, CAMPOS_USUARIO)
+        formatear = proyector(campos)
+        if modo:
+            resultado = stream_users(pais, ciudad, edad_min, edad_max, correo, after=after, campos=campos)
+            if resultado["success"]:
+                return respuesta_streaming(resultado["data"], formatear, modo)
+            return jsonify({"success": False, "message": resultado.get("message", "Error al listar usuarios")}), 400
+
+        resultado = get_users(pais, ciudad, edad_min, edad_max, correo, limit=limit, after=after, campos=campos)
         if resultado["success"]:
-            usuarios_formateados = [formatear_usuario(u) for u in resultado["data"]]
-            return jsonify({"success": True, "data": usuarios_formateados}), 200
-        return jsonify({"success": False, "message": "Error al listar usuarios"}), 400
+            usuarios_formateados = [formatear(u) for u in resultado["data"]]
+            return respuesta_json({"success": True, "data": usuarios_formateados, "limit": limit,
+                                   "next_cursor": resultado["next_cursor"]})
+        return jsonify({"success": False, "message": resultado.get("message", "Error al listar usuarios")}), 400
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al listar usuarios: {e}"}), 500
 
@@ -100,10 +105,13 @@ def listar_usuarios():
 @jwt_required()
 def usuario_por_id(user_id):
     try:
-        resultado = get_user_by_id(user_id)
+        campos = campos_pedidos(request.args, CAMPOS_USUARIO)
+        resultado = get_user_by_id(user_id, campos)
         if resultado["success"]:
-            return jsonify({"success": True, "data": formatear_usuario(resultado["data"])}), 200
+            return respuesta_json({"success": True, "data": proyector(campos)(resultado["data"])})
         return jsonify({"success": False, "message": "Usuario no encontrado"}), 404
+    except InvalidFields as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al obtener usuario: {e}"}), 500
 
@@ -151,10 +159,20 @@ def eliminar_usuario(user_id):
 def exportar_usuarios():
     try:
         formato = request.args.get("formato", "json").lower()
-        usuarios = get_users()["data"]
-        resultado = export_users(usuarios, formato)
-        status = 200 if resultado["success"] else 400
-        return jsonify(resultado), status
+        comprimir = flag(request.args, "gzip")
+        # ?incremental=1: solo los cambios desde la última exportación incremental (siempre como trabajo,
+        # así la marca de agua avanza únicamente cuando el archivo quedó escrito)
+        incremental = flag(request.args, "incremental")
+        error = formato_no_soportado(formato)
+        if error:
+            return jsonify({"success": False, "message": error}), 400
+        if flag(request.args, "descarga") and not incremental:
+            resultado = stream_users(campos=COLUMNAS_USUARIO)
+            if not resultado["success"]:
+                return jsonify(resultado), 400
+            respuesta = respuesta_descarga(resultado["data"], "usuarios", formato, COLUMNAS_USUARIO, comprimir)
+            return respuesta or (jsonify({"success": False, "message": "No hay usuarios para exportar."}), 400)
+        return respuesta_job(submit_job("exportar_usuarios", {"formato": formato, "gzip": comprimir, "incremental": incremental}))
     except Exception as e:
         return jsonify({"success": False, "message": f"Error inesperado al exportar usuarios: {e}"}), 500
 
@@ -162,8 +180,8 @@ def exportar_usuarios():
 @usuarios_bp.route("/logout", methods=["POST"])
 @jwt_required()
 def logout_usuario():
-    token_jti = get_jwt()["jti"]
-    BLACKLIST.add(token_jti)
+    token = get_jwt()
+    BLACKLIST.add(token["jti"], token["exp"])
     return jsonify({"success": True, "message": "Logout exitoso"}), 200
 
 
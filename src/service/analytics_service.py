@@ -0,0 +1,186 @@
+# service/analytics_service.py
+# Analítica vectorizada: las ventas se cargan como columnas NumPy tipadas (no listas de dicts)
+# y los agrupamientos, percentiles y cohortes se calculan con operaciones vectoriales.
+from database import get_db, STREAM_CHUNK_SIZE
+
+# NumPy se importa en la primera consulta de analítica, no al cargar las rutas (ver _numpy_disponible)
+np = None
+
+CHUNK_ANALITICA = max(STREAM_CHUNK_SIZE, 50000)
+
+# Columnas numéricas calculadas en SQLite: dia = días desde 1970-01-01, mes = año * 12 + (mes - 1)
+COLUMNAS_SQL = """
+    SELECT CAST(user_id AS INTEGER), CAST(product_id AS INTEGER), cantidad, total,
+           CAST(julianday(substr(fecha, 1, 10)) - 2440587.5 AS INTEGER),
+           CAST(substr(fecha, 1, 4) AS INTEGER) * 12 + CAST(substr(fecha, 6, 2) AS INTEGER) - 1
+    FROM sales WHERE julianday(substr(fecha, 1, 10)) IS NOT NULL
+"""
+# Tipo de cada columna, en el orden de COLUMNAS_SQL
+TIPOS_COLUMNAS = (("user_id", "int64"), ("product_id", "int64"), ("cantidad", "int64"),
+                  ("total", "float64"), ("dia", "int32"), ("mes", "int32"))
+AGRUPACIONES = ("producto", "usuario", "mes", "dia")
+
+
+def _numpy_disponible():
+    """Importa NumPy la primera vez; dependencia opcional: sin ella los endpoints de analítica responden 503."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+def _sin_numpy():
+    return {"success": False, "message": "NumPy no está instalado: analítica no disponible", "status": 503}
+
+
+def _rango(desde, hasta):
+    query, params = COLUMNAS_SQL, []
+    if desde:
+        query += " AND fecha >= ?"; params.append(desde)
+    if hasta:
+        query += " AND fecha < ?"; params.append(hasta)
+    return query, params
+
+
+def load_sales_arrays(desde=None, hasta=None, chunk_size=CHUNK_ANALITICA):
+    """
+    Carga las ventas en arreglos preasignados: user_id, product_id, cantidad (int64),
+    total (float64), dia y mes (int32). Lee por bloques con fetchmany dentro de una
+    sola transacción de lectura, así el COUNT y el SELECT ven el mismo snapshot.
+    Las ventas con una fecha que SQLite no entiende se omiten.
+    """
+    if not _numpy_disponible():
+        raise RuntimeError(_sin_numpy()["message"])
+    query, params = _rango(desde, hasta)
+    with get_db() as conn:
+        conn.execute("BEGIN")
+        n = conn.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+        columnas = {nombre: np.empty(n, dtype=tipo) for nombre, tipo in TIPOS_COLUMNAS}
+        cursor = conn.cursor()
+        cursor.row_factory = None  # tuplas planas: evitan crear un sqlite3.Row por venta
+        cursor.execute(query, params)
+        i = 0
+        while i < n:
+            filas = cursor.fetchmany(min(chunk_size, n - i))
+            if not filas:
+                break
+            j = i + len(filas)
+            # Cada columna se convierte con su propio tipo: los ids no pasan por float64
+            for (nombre, tipo), valores in zip(TIPOS_COLUMNAS, zip(*filas)):
+                columnas[nombre][i:j] = np.fromiter(valores, dtype=tipo, count=len(filas))
+            i = j
+        conn.rollback()
+    return {nombre: arr[:i] for nombre, arr in columnas.items()}
+
+
+def _etiqueta(por, claves):
+    if por == "mes":
+        return [f"{m // 12:04d}-{m % 12 + 1:02d}" for m in claves.tolist()]
+    if por == "dia":
+        return np.datetime_as_string(claves.astype("datetime64[D]")).tolist()
+    return claves.tolist()
+
+
+def revenue_by(por="producto", desde=None, hasta=None):
+    """Ingresos, unidades y número de ventas por producto, usuario, mes o día."""
+    if not _numpy_disponible():
+        return _sin_numpy()
+    try:
+        if por not in AGRUPACIONES:
+            return {"success": False, "message": f"Agrupación inválida, use una de: {', '.join(AGRUPACIONES)}"}
+        ventas = load_sales_arrays(desde, hasta)
+        campo = {"producto": "product_id", "usuario": "user_id"}.get(por, por)
+        claves, inverso = np.unique(ventas[campo], return_inverse=True)
+        ingresos = np.bincount(inverso, weights=ventas["total"], minlength=len(claves))
+        unidades = np.bincount(inverso, weights=ventas["cantidad"], minlength=len(claves))
+        conteo = np.bincount(inverso, minlength=len(claves))
+        data = [
+            {"clave": c, "ventas": int(v), "unidades": int(u), "ingresos": round(float(t), 2)}
+            for c, v, u, t in zip(_etiqueta(por, claves), conteo, unidades, ingresos)
+        ]
+        return {"success": True, "data": data}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def sale_percentiles(campo="total", percentiles=(50, 90, 95, 99), desde=None, hasta=None):
+    """Percentiles del total o de la cantidad por venta."""
+    if not _numpy_disponible():
+        return _sin_numpy()
+    try:
+        if campo not in ("total", "cantidad"):
+            return {"success": False, "message": "Campo inválido, use total o cantidad"}
+        valores = load_sales_arrays(desde, hasta)[campo]
+        if not len(valores):
+            return {"success": True, "data": {}}
+        resultado = np.percentile(valores, percentiles)
+        return {"success": True, "data": {f"p{p:g}": round(float(v), 2) for p, v in zip(percentiles, resultado)}}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def moving_average(ventana=7, desde=None, hasta=None):
+    """Ingresos diarios (rellenando días sin ventas con 0) y su media móvil de `ventana` días."""
+    if not _numpy_disponible():
+        return _sin_numpy()
+    try:
+        if ventana < 1:
+            return {"success": False, "message": "La ventana debe ser mayor a cero"}
+        ventas = load_sales_arrays(desde, hasta)
+        if not len(ventas["dia"]):
+            return {"success": True, "data": []}
+        inicio = int(ventas["dia"].min())
+        diarios = np.bincount(ventas["dia"] - inicio, weights=ventas["total"])
+        acumulado = np.concatenate(([0.0], np.cumsum(diarios)))
+        media = np.full(len(diarios), np.nan)
+        if len(diarios) >= ventana:
+            media[ventana - 1:] = (acumulado[ventana:] - acumulado[:-ventana]) / ventana
+        dias = np.arange(inicio, inicio + len(diarios))
+        data = [
+            {"dia": d, "ingresos": round(float(t), 2), "media_movil": None if np.isnan(m) else round(float(m), 2)}
+            for d, t, m in zip(_etiqueta("dia", dias), diarios, media)
+        ]
+        return {"success": True, "data": data}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def cohort_retention(desde=None, hasta=None):
+    """
+    Retención mensual por cohorte: la cohorte de un usuario es el mes de su primera compra,
+    y para cada mes posterior se calcula la fracción de la cohorte que volvió a comprar.
+    """
+    if not _numpy_disponible():
+        return _sin_numpy()
+    try:
+        ventas = load_sales_arrays(desde, hasta)
+        if not len(ventas["mes"]):
+            return {"success": True, "data": []}
+        usuarios, u_idx = np.unique(ventas["user_id"], return_inverse=True)
+        primer_mes = np.full(len(usuarios), np.iinfo(np.int32).max, dtype=np.int32)
+        np.minimum.at(primer_mes, u_idx, ventas["mes"])
+        desfase = ventas["mes"] - primer_mes[u_idx]
+
+        # Pares (usuario, desfase) únicos: un usuario cuenta una vez por mes activo
+        pares = np.unique(u_idx.astype(np.int64) * (int(desfase.max()) + 1) + desfase)
+        p_usuario, p_desfase = np.divmod(pares, int(desfase.max()) + 1)
+
+        cohortes, c_idx = np.unique(primer_mes, return_inverse=True)
+        activos = np.zeros((len(cohortes), int(desfase.max()) + 1), dtype=np.int64)
+        np.add.at(activos, (c_idx[p_usuario], p_desfase), 1)
+        tamaño = activos[:, 0]
+        ultimo_mes = int(ventas["mes"].max())
+
+        # Cada cohorte solo tiene tantos meses observados como hay hasta el último mes con datos
+        data = [
+            {"cohorte": etiqueta, "usuarios": int(tamaño[i]),
+             "retencion": [round(float(x), 4) for x in activos[i, :ultimo_mes - int(cohortes[i]) + 1] / tamaño[i]]}
+            for i, etiqueta in enumerate(_etiqueta("mes", cohortes))
+        ]
+        return {"success": True, "data": data}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
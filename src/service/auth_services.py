@@ -1,13 +1,72 @@
 # auth_services.py
+import os
+import threading
+import time
 from flask_jwt_extended import decode_token
+from database import get_db
 
-BLACKLIST = set()  # <-- define aquí
+BLOCKLIST_REFRESH_SECONDS = float(os.getenv("JWT_BLOCKLIST_REFRESH", 2))
+BLOCKLIST_EVICT_SECONDS = float(os.getenv("JWT_BLOCKLIST_EVICT", 3600))
+
+
+class TokenBlocklist:
+    """
+    Tokens revocados guardados en la tabla token_blocklist (compartida por todos los workers).
+    Cada proceso mantiene una copia en memoria (jti -> exp) y solo lee de la base las filas nuevas,
+    como mucho una vez cada `refresh` segundos: la verificación de un token no revocado no toca SQLite.
+    Las entradas vencidas se purgan de la tabla y de la copia cada `evict` segundos.
+    """
+
+    def __init__(self, refresh=BLOCKLIST_REFRESH_SECONDS, evict=BLOCKLIST_EVICT_SECONDS):
+        self.refresh = refresh
+        self.evict = evict
+        self._revocados = {}
+        self._ultimo_id = 0
+        self._proxima_sync = 0.0
+        self._proxima_purga = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, jti, exp):
+        with get_db() as conn:
+            conn.execute("INSERT OR IGNORE INTO token_blocklist (jti, exp) VALUES (?, ?)", (jti, int(exp)))
+        with self._lock:
+            self._revocados[jti] = int(exp)
+
+    def __contains__(self, jti):
+        ahora = time.time()
+        if ahora >= self._proxima_sync:
+            self._sync(ahora)
+        return jti in self._revocados
+
+    def __len__(self):
+        return len(self._revocados)
+
+    def _sync(self, ahora):
+        with self._lock:
+            if ahora < self._proxima_sync:
+                return  # otro hilo ya sincronizó
+            with get_db() as conn:
+                if ahora >= self._proxima_purga:
+                    conn.execute("DELETE FROM token_blocklist WHERE exp < ?", (int(ahora),))
+                    self._revocados = {j: e for j, e in self._revocados.items() if e >= ahora}
+                    self._proxima_purga = ahora + self.evict
+                nuevos = conn.execute(
+                    "SELECT id, jti, exp FROM token_blocklist WHERE id > ? AND exp >= ? ORDER BY id",
+                    (self._ultimo_id, int(ahora))
+                ).fetchall()
+            for row in nuevos:
+                self._revocados[row["jti"]] = row["exp"]
+            if nuevos:
+                self._ultimo_id = nuevos[-1]["id"]
+            self._proxima_sync = ahora + self.refresh
+
+
+BLACKLIST = TokenBlocklist()  # <-- define aquí
 
 def logout(token):
     try:
         decoded = decode_token(token)
-        jti = decoded["jti"]
-        BLACKLIST.add(jti)
+        BLACKLIST.add(decoded["jti"], decoded["exp"])
         return {"success": True, "message": "Logout exitoso"}
     except Exception as e:
         return {"success": False, "message": str(e)}
@@ -0,0 +1,90 @@
+# service/change_service.py
+# Cambios por tabla a partir de la marca de agua (watermark) de la última exportación.
+# La tabla `cambios` la mantienen los triggers de la migración 6 de database.py.
+from database import get_db, iter_chunks, TABLAS_CAMBIOS
+
+
+def current_seq(conn):
+    return conn.execute("SELECT valor FROM cambios_seq WHERE id = 1").fetchone()[0]
+
+
+def get_watermark(tabla):
+    with get_db() as conn:
+        row = conn.execute("SELECT seq FROM export_watermarks WHERE tabla=?", (tabla,)).fetchone()
+    return row["seq"] if row else None
+
+
+def save_watermark(tabla, seq):
+    """Registra la nueva marca de agua; nunca retrocede si otra exportación ya guardó una mayor."""
+    with get_db() as conn:
+        conn.execute('''
+            INSERT INTO export_watermarks (tabla, seq, actualizado) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (tabla) DO UPDATE SET seq = excluded.seq, actualizado = excluded.actualizado
+            WHERE excluded.seq > export_watermarks.seq
+        ''', (tabla, seq))
+
+
+def count_changes(tabla):
+    """Filas que entraría en la próxima exportación incremental (la tabla completa si aún no hay marca)."""
+    desde = get_watermark(tabla)
+    with get_db() as conn:
+        if desde is None:
+            return conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM cambios WHERE tabla=? AND seq > ?", (tabla, desde)).fetchone()[0]
+
+
+def changes_since(tabla, columnas=None):
+    """
+    Filas insertadas, modificadas o borradas después de la marca de agua de `tabla`.
+    Cada fila lleva `operacion` ('upsert' o 'delete'); las borradas solo traen el id (tombstone).
+    Sin marca previa se devuelve la tabla completa como upserts. `hasta` es la marca a guardar
+    una vez escrito el archivo: lo que cambie durante la exportación entra en la siguiente.
+    """
+    try:
+        if tabla not in TABLAS_CAMBIOS:
+            return {"success": False, "message": f"La tabla {tabla} no registra cambios"}
+        desde = get_watermark(tabla)
+        with get_db() as conn:
+            hasta = current_seq(conn)
+            columnas = list(columnas or [c["name"] for c in conn.execute(f"PRAGMA table_info({tabla})")])
+        resto = ", ".join(f"t.{c}" for c in columnas if c != "id")
+        if desde is None:
+            query = f"SELECT 'upsert' AS operacion, t.id, {resto} FROM {tabla} t ORDER BY t.id"
+            params = ()
+        else:
+            query = f'''
+                SELECT c.operacion, c.fila_id AS id, {resto}
+                FROM cambios c LEFT JOIN {tabla} t ON t.id = c.fila_id AND c.operacion = 'upsert'
+                WHERE c.tabla = ? AND c.seq > ? AND c.seq <= ?
+                ORDER BY c.seq
+            '''
+            params = (tabla, desde, hasta)
+        return {"success": True, "data": iter_chunks(query, params), "desde": desde, "hasta": hasta,
+                "columnas": ["operacion", "id"] + [c for c in columnas if c != "id"]}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def table_version(tabla):
+    """(seq, fecha) del último cambio registrado en la tabla; (0, None) si aún no hubo ninguno."""
+    with get_db() as conn:
+        row = conn.execute(
+            "SELECT seq, fecha FROM cambios WHERE tabla=? ORDER BY seq DESC LIMIT 1", (tabla,)
+        ).fetchone()
+    return (row["seq"], row["fecha"]) if row else (0, None)
+
+
+def row_version(tabla, fila_id, conn=None):
+    """
+    (seq, fecha) del último cambio de la fila, o None si la fila no existe.
+    Con `conn` se consulta en esa conexión (p. ej. en la misma transacción que lee la fila).
+    """
+    if conn is None:
+        with get_db() as conn:
+            return row_version(tabla, fila_id, conn)
+    row = conn.execute(
+        f"SELECT COALESCE(c.seq, 0) AS seq, c.fecha FROM {tabla} t "
+        "LEFT JOIN cambios c ON c.tabla = ? AND c.fila_id = t.id WHERE t.id = ?",
+        (tabla, fila_id)
+    ).fetchone()
+    return (row["seq"], row["fecha"]) if row else None
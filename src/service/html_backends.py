@@ -0,0 +1,149 @@
+# service/html_backends.py
+# Backends de parseo HTML intercambiables para el scraper.
+# Orden de preferencia en modo "auto": selectolax (lexbor) > BeautifulSoup+lxml > BeautifulSoup+html.parser
+import os
+import re
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+PARSER_BACKEND = os.getenv("SCRAPER_PARSER", "auto")
+
+
+class _Subarboles(SoupStrainer):
+    """
+    Solo construye los subárboles que pueden contener datos útiles (meta description,
+    contenedores de producto, precios, breadcrumbs...). El resto del documento se descarta
+    durante el parseo, sin crear objetos Tag.
+    """
+
+    def __init__(self, tags=(), ids=(), clases=(), metas=()):
+        super().__init__()
+        self.tags = frozenset(tags)
+        self.ids = frozenset(ids)
+        self.clases = frozenset(clases)
+        self.metas = frozenset(metas)
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        if name in self.tags:
+            return True
+        if not attrs:
+            return False
+        if name == "meta":
+            return attrs.get("name") in self.metas
+        if attrs.get("id") in self.ids:
+            return True
+        clase = attrs.get("class")
+        if clase:
+            if isinstance(clase, str):
+                clase = clase.split()
+            return not self.clases.isdisjoint(clase)
+        return False
+
+    def allow_string_creation(self, string):
+        return False
+
+
+class SoupBackend:
+    """BeautifulSoup con selectores precompilados y parseo restringido a subárboles."""
+
+    def __init__(self, parser=None):
+        self.name = f"bs4-{parser or ('lxml' if HAS_LXML else 'html.parser')}"
+        self.parser = parser or ("lxml" if HAS_LXML else "html.parser")
+        self._compilados = {}
+
+    def parse(self, html, solo=None):
+        return BeautifulSoup(html, self.parser, parse_only=solo)
+
+    def _css(self, selector):
+        compilado = self._compilados.get(selector)
+        if compilado is None:
+            compilado = self._compilados[selector] = soupsieve.compile(selector)
+        return compilado
+
+    def first(self, doc, selector):
+        return self._css(selector).select_one(doc)
+
+    def all(self, doc, selector):
+        return self._css(selector).select(doc)
+
+    def text(self, node, sep=""):
+        return node.get_text(sep, strip=True)
+
+    def tag(self, node):
+        return node.name
+
+    def attr(self, node, name, default=None):
+        return node.get(name, default)
+
+
+class SelectolaxBackend:
+    """Parser en C (lexbor) con motor CSS propio; no necesita restringir el árbol."""
+
+    name = "selectolax"
+
+    def parse(self, html, solo=None):
+        return LexborHTMLParser(html)
+
+    def first(self, doc, selector):
+        return doc.css_first(selector)
+
+    def all(self, doc, selector):
+        return doc.css(selector)
+
+    def text(self, node, sep=""):
+        return node.text(separator=sep, strip=True)
+
+    def tag(self, node):
+        return node.tag
+
+    def attr(self, node, name, default=None):
+        valor = node.attributes.get(name)
+        return default if valor is None else valor
+
+
+def subarboles(selectores):
+    """Construye el filtro de subárboles a partir de una lista de selectores CSS simples."""
+    tags, ids, clases, metas = set(), set(), set(), set()
+    for selector in selectores:
+        primero = selector.split()[0]
+        meta = re.match(r"meta\[name=['\"]?([\w-]+)", primero)
+        if meta:
+            metas.add(meta.group(1))
+            continue
+        ids.update(re.findall(r"#([\w-]+)", primero))
+        clases.update(re.findall(r"\.([\w-]+)", primero))
+        if not re.search(r"[#.\[]", primero):
+            tags.add(primero)
+    return _Subarboles(tags, ids, clases, metas)
+
+
+_backends = {}
+
+
+def get_backend(name=None):
+    name = name or PARSER_BACKEND
+    if name == "auto":
+        name = "selectolax" if LexborHTMLParser is not None else "bs4"
+    if name not in _backends:
+        if name == "selectolax":
+            if LexborHTMLParser is None:
+                raise ImportError("selectolax no está instalado")
+            _backends[name] = SelectolaxBackend()
+        elif name == "bs4":
+            _backends[name] = SoupBackend()
+        elif name in ("lxml", "html.parser"):
+            _backends[name] = SoupBackend(name)
+        else:
+            raise ValueError(f"Backend de parseo desconocido: {name}")
+    return _backends[name]
@@ -0,0 +1,260 @@
+# service/job_service.py
+# Cola de trabajos en segundo plano para exportaciones y reportes.
+# El estado vive en la tabla jobs (compartida entre procesos); la ejecución en un pool de hilos local.
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from database import get_db
+from service.change_service import count_changes
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", 24))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", 600))
+JOB_PURGE_INTERVAL = float(os.getenv("JOB_PURGE_INTERVAL", 60))
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join("exports", "jobs"))
+
+ESTADOS_ACTIVOS = ("pendiente", "en_proceso")
+ESTADOS_FINALES = ("expirado", "error")
+# Columnas públicas: la ruta del archivo queda en la base y solo la lee la descarga (get_job_file)
+COLUMNAS_JOB = "id, tipo, params, estado, filas, total, message, creado, actualizado, expira"
+
+_tareas = {}
+_executor = None
+_executor_lock = threading.Lock()
+_ultima_purga = 0.0
+_purga_lock = threading.Lock()
+
+
+def task(tipo):
+    """Registra la función que ejecuta los trabajos de un tipo: tarea(params, directorio, avance)."""
+    def registrar(funcion):
+        _tareas[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        return _executor
+
+
+def _clave(tipo, params):
+    return hashlib.sha256(json.dumps([tipo, params], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _fecha(epoch):
+    return datetime.fromtimestamp(epoch).isoformat(timespec="seconds") if epoch else None
+
+
+def _formatear(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["progreso"] = round(job["filas"] / job["total"], 4) if job["total"] else (1.0 if job["estado"] == "completado" else 0.0)
+    for campo in ("creado", "actualizado", "expira"):
+        job[campo] = _fecha(job[campo])
+    return job
+
+
+def _actualizar(job_id, si_estado=None, **campos):
+    """Actualiza el trabajo (solo si sigue en `si_estado`, cuando se indica); True si se modificó."""
+    campos["actualizado"] = time.time()
+    asignaciones = ", ".join(f"{c}=?" for c in campos)
+    query, params = f"UPDATE jobs SET {asignaciones} WHERE id=?", [*campos.values(), job_id]
+    if si_estado:
+        query += " AND estado=?"; params.append(si_estado)
+    with get_db() as conn:
+        return conn.execute(query, params).rowcount > 0
+
+
+class _Avance:
+    """Acumula las filas procesadas; cada llamada también sirve de latido del trabajo."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.filas = 0
+
+    def total(self, n):
+        _actualizar(self.job_id, total=n)
+
+    def __call__(self, n):
+        self.filas += n
+        _actualizar(self.job_id, filas=self.filas)
+
+
+def _ejecutar(job_id, tipo, params):
+    directorio = os.path.join(JOBS_DIR, job_id)
+    # Si la purga lo dio por abandonado mientras esperaba en la cola, no se ejecuta
+    if not _actualizar(job_id, si_estado="pendiente", estado="en_proceso"):
+        return
+    try:
+        resultado = _tareas[tipo](params, directorio, _Avance(job_id))
+        if resultado["success"]:
+            # El mensaje es público: se deja el nombre del archivo, sin el directorio
+            path = resultado["path"]
+            mensaje = (resultado.get("message") or "").replace(path, os.path.basename(path)) or None
+            if _actualizar(job_id, si_estado="en_proceso", estado="completado", path=os.path.abspath(path),
+                           message=mensaje, expira=time.time() + JOB_RETENTION_HOURS * 3600):
+                return
+        else:
+            _actualizar(job_id, si_estado="en_proceso", estado="error", message=resultado.get("message"))
+    except Exception as e:
+        _actualizar(job_id, si_estado="en_proceso", estado="error", message=str(e))
+    # Un trabajo fallido (o purgado mientras corría) no deja archivos a medio escribir
+    shutil.rmtree(directorio, ignore_errors=True)
+
+
+def submit_job(tipo, params):
+    """
+    Encola un trabajo y devuelve su registro sin esperar a que termine.
+    Si ya hay uno idéntico (mismo tipo y parámetros) pendiente o en proceso, devuelve ese.
+    """
+    try:
+        if tipo not in _tareas:
+            return {"success": False, "message": f"Tipo de trabajo desconocido: {tipo}"}
+        _purgar_si_toca()
+        clave, ahora = _clave(tipo, params), time.time()
+        with get_db() as conn:
+            # BEGIN IMMEDIATE serializa la deduplicación entre hilos y procesos
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                f"SELECT {COLUMNAS_JOB} FROM jobs WHERE clave=? AND estado IN (?, ?) AND actualizado > ? "
+                "ORDER BY creado LIMIT 1",
+                (clave, *ESTADOS_ACTIVOS, ahora - JOB_STALE_SECONDS)
+            ).fetchone()
+            if row:
+                return {"success": True, "data": _formatear(row), "nuevo": False}
+            job_id = uuid.uuid4().hex
+            row = conn.execute(
+                f"INSERT INTO jobs (id, tipo, params, clave, creado, actualizado) VALUES (?, ?, ?, ?, ?, ?) "
+                f"RETURNING {COLUMNAS_JOB}",
+                (job_id, tipo, json.dumps(params, sort_keys=True), clave, ahora, ahora)
+            ).fetchone()
+        _get_executor().submit(_ejecutar, job_id, tipo, params)
+        return {"success": True, "data": _formatear(row), "nuevo": True}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def get_job(job_id):
+    try:
+        _purgar_si_toca()
+        with get_db() as conn:
+            row = conn.execute(f"SELECT {COLUMNAS_JOB} FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row:
+            return {"success": True, "data": _formatear(row)}
+        return {"success": False, "message": "Trabajo no encontrado"}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def get_job_file(job_id):
+    """Estado y ruta del archivo de un trabajo, para la descarga (la ruta no se publica en el JSON)."""
+    try:
+        with get_db() as conn:
+            row = conn.execute("SELECT estado, path FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row:
+            return {"success": True, "data": dict(row)}
+        return {"success": False, "message": "Trabajo no encontrado"}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def purge_expired_jobs():
+    """
+    Limpia la tabla jobs y JOBS_DIR:
+    - completados con la retención vencida pasan a expirado y se borran sus archivos;
+    - pendientes o en proceso sin avance en JOB_STALE_SECONDS pasan a error (abandonados);
+    - expirados y fallidos se eliminan una vez pasada la retención.
+    Los directorios de todos ellos se borran. Devuelve cuántos trabajos se limpiaron.
+    """
+    ahora = time.time()
+    retencion = JOB_RETENTION_HOURS * 3600
+    with get_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        vencidos = conn.execute(
+            "UPDATE jobs SET estado='expirado', path=NULL, actualizado=? "
+            "WHERE expira IS NOT NULL AND expira < ? AND estado='completado' RETURNING id",
+            (ahora, ahora)
+        ).fetchall()
+        abandonados = conn.execute(
+            "UPDATE jobs SET estado='error', message=?, actualizado=? "
+            "WHERE estado IN (?, ?) AND actualizado < ? RETURNING id",
+            (f"Trabajo abandonado: sin avance en {JOB_STALE_SECONDS:g} s", ahora, *ESTADOS_ACTIVOS,
+             ahora - JOB_STALE_SECONDS)
+        ).fetchall()
+        eliminados = conn.execute(
+            "DELETE FROM jobs WHERE estado IN (?, ?) AND actualizado < ? RETURNING id",
+            (*ESTADOS_FINALES, ahora - retencion)
+        ).fetchall()
+    for row in (*vencidos, *abandonados, *eliminados):
+        shutil.rmtree(os.path.join(JOBS_DIR, row["id"]), ignore_errors=True)
+    return len(vencidos) + len(abandonados) + len(eliminados)
+
+
+def _purgar_si_toca():
+    """Purga como mucho una vez cada JOB_PURGE_INTERVAL segundos por proceso (se llama al leer o encolar)."""
+    global _ultima_purga
+    with _purga_lock:
+        if time.time() - _ultima_purga < JOB_PURGE_INTERVAL:
+            return
+        _ultima_purga = time.time()
+    purge_expired_jobs()
+
+
+# -------------------- TAREAS --------------------
+# Los módulos de exportación se importan al ejecutar la tarea, no al cargar el servicio.
+
+def _contar(query, params=()):
+    with get_db() as conn:
+        return conn.execute(query, params).fetchone()[0]
+
+
+@task("exportar_productos")
+def _exportar_productos(params, directorio, avance):
+    from exports.export_products import export_products
+    from service.product_service import stream_products
+    if params.get("incremental"):
+        avance.total(count_changes("productos"))
+        return export_products(None, params["formato"], params["gzip"], directorio, avance, incremental=True)
+    avance.total(_contar("SELECT COUNT(*) FROM productos"))
+    return export_products(stream_products()["data"], params["formato"], params["gzip"], directorio, avance)
+
+
+@task("exportar_ventas")
+def _exportar_ventas(params, directorio, avance):
+    from exports.export_sales import export_sales
+    from service.sales_services import stream_sales
+    if params.get("incremental"):
+        avance.total(count_changes("sales"))
+        return export_sales(None, params["formato"], params["gzip"], directorio, avance, incremental=True)
+    avance.total(_contar("SELECT COUNT(*) FROM sales"))
+    return export_sales(stream_sales()["data"], params["formato"], params["gzip"], directorio, avance)
+
+
+@task("exportar_usuarios")
+def _exportar_usuarios(params, directorio, avance):
+    from exports.export_users import export_users, COLUMNAS_USUARIO
+    from service.user_service import stream_users
+    if params.get("incremental"):
+        avance.total(count_changes("users"))
+        return export_users(None, params["formato"], params["gzip"], directorio, avance, incremental=True)
+    avance.total(_contar("SELECT COUNT(*) FROM users"))
+    return export_users(stream_users(campos=COLUMNAS_USUARIO)["data"], params["formato"], params["gzip"], directorio, avance)
+
+
+@task("reporte_mensual")
+def _reporte_mensual(params, directorio, avance):
+    from exports.report_sales import monthly_report
+    from service.sales_services import month_range
+    desde, hasta = month_range(params["año"], params["mes"])
+    avance.total(_contar("SELECT COUNT(*) FROM sales WHERE fecha >= ? AND fecha < ?", (desde, hasta)))
+    return monthly_report(params["mes"], params["año"], directorio, avance)
@@ -0,0 +1,68 @@
+import base64
+import json
+
+# service/pagination.py
+# Paginación por cursor (keyset): cada página cuesta lo mismo sin importar la profundidad.
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(*values):
+    """Convierte la clave de la última fila en un cursor opaco para el cliente."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise InvalidCursor("Cursor inválido")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Cursor inválido")
+    return values
+
+
+def page_args(args):
+    """Lee limit y after de los query params, acotando limit a MAX_LIMIT."""
+    limit = args.get("limit", DEFAULT_LIMIT, type=int)
+    if limit is None or limit < 1:
+        limit = DEFAULT_LIMIT
+    return min(limit, MAX_LIMIT), args.get("after")
+
+
+def paginate(query, params, keys, limit=None, after=None):
+    """
+    Agrega el filtro keyset y el ORDER BY a una consulta "... WHERE 1=1 ...".
+    keys son las columnas de la clave de orden (la última debe ser única, p. ej. id).
+    Se pide limit + 1 filas para saber si existe una página siguiente.
+    """
+    params = list(params)
+    if after:
+        values = decode_cursor(after, len(keys))
+        if len(keys) == 1:
+            query += f" AND {keys[0]} > ?"
+        else:
+            query += f" AND ({', '.join(keys)}) > ({', '.join('?' * len(keys))})"
+        params.extend(values)
+    query += f" ORDER BY {', '.join(keys)}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    return query, tuple(params)
+
+
+def build_page(rows, keys, limit=None):
+    """Recorta la fila extra y calcula next_cursor a partir de la última fila devuelta."""
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(*(last[k] for k in keys))
+    return rows, next_cursor
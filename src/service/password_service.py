@@ -0,0 +1,96 @@
+# service/password_service.py
+# Hash de contraseñas fuera del hilo de la petición: un pool de procesos acotado hace el trabajo
+# de CPU (scrypt/pbkdf2) y, si ya hay demasiadas operaciones en cola, se rechaza con HasherBusy.
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# Método en el formato de werkzeug: "scrypt", "scrypt:32768:8:1", "pbkdf2:sha256:600000"...
+PASSWORD_METHOD = os.getenv("PASSWORD_METHOD", "scrypt:32768:8:1")
+PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", 16))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", min(os.cpu_count() or 1, 4)))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", PASSWORD_WORKERS * 4))
+PASSWORD_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_QUEUE_TIMEOUT", 0.5))
+
+
+class HasherBusy(RuntimeError):
+    """El pool de hash está saturado; la ruta debe responder 503."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pendientes = threading.BoundedSemaphore(PASSWORD_MAX_PENDING)
+_metodo_actual = None
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: los hijos no heredan los hilos ni las conexiones abiertas del servidor
+            _pool = ProcessPoolExecutor(PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reiniciar_pool(roto):
+    """Descarta el pool si sigue siendo `roto` (otro hilo puede haberlo reemplazado ya)."""
+    global _pool
+    with _pool_lock:
+        if _pool is roto:
+            roto.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _enviar(funcion, *args):
+    """
+    Ejecuta funcion(*args) en el pool y espera el resultado, con un tope de operaciones en curso.
+    Si un proceso hijo murió el pool queda inutilizable: se crea uno nuevo y se reintenta una vez.
+    """
+    if not _pendientes.acquire(timeout=PASSWORD_QUEUE_TIMEOUT):
+        raise HasherBusy("Servicio de autenticación saturado, intente nuevamente")
+    try:
+        for _ in range(2):
+            pool = _get_pool()
+            try:
+                return pool.submit(funcion, *args).result()
+            except BrokenProcessPool:
+                _reiniciar_pool(pool)
+        raise HasherBusy("Servicio de autenticación no disponible, intente nuevamente")
+    finally:
+        _pendientes.release()
+
+
+def _generar(password, metodo, salt_length):
+    return generate_password_hash(password, metodo, salt_length)
+
+
+def hash_password(password):
+    return _enviar(_generar, password, PASSWORD_METHOD, PASSWORD_SALT_LENGTH)
+
+
+def verify_password(clave_hash, password):
+    return _enviar(check_password_hash, clave_hash, password)
+
+
+def current_method():
+    """
+    Prefijo que werkzeug escribe para PASSWORD_METHOD, con sus parámetros por defecto ya
+    expandidos ("scrypt" -> "scrypt:32768:8:1"). Se deriva del texto, sin calcular ningún hash.
+    """
+    global _metodo_actual
+    if _metodo_actual is None:
+        metodo, *args = PASSWORD_METHOD.split(":")
+        if metodo == "scrypt" and not args:
+            args = [2 ** 15, 8, 1]
+        elif metodo == "pbkdf2" and len(args) < 2:
+            args = (args or ["sha256"]) + [DEFAULT_PBKDF2_ITERATIONS]
+        _metodo_actual = ":".join([metodo, *map(str, args)])
+    return _metodo_actual
+
+
+def needs_rehash(clave_hash):
+    """True si el hash guardado usa un algoritmo o parámetros distintos de los configurados."""
+    return clave_hash.split("$", 1)[0] != current_method()
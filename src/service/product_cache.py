@@ -0,0 +1,78 @@
+# service/product_cache.py
+# Caché en memoria (LRU + TTL) de productos por id, delante de get_product_by_id.
+# Cada entrada es (producto, versión): el GET condicional no necesita consultar la base.
+# Las escrituras de productos y los cambios de stock por ventas invalidan la entrada.
+# Es por proceso: otro worker ve los cambios como mucho PRODUCT_CACHE_TTL segundos después.
+import os
+import threading
+import time
+from collections import OrderedDict
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", 1024))
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", 30))
+
+
+class LRUCache:
+    """Diccionario acotado: descarta la entrada menos usada al llenarse y las vencidas al leerlas."""
+
+    def __init__(self, max_size=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._generacion = 0  # cambia con cada invalidación; evita guardar lecturas previas a una escritura
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                valor, vence = entrada
+                if vence > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self.hits += 1
+                    return valor
+                del self._datos[clave]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def generation(self):
+        return self._generacion
+
+    def put(self, clave, valor, generacion=None):
+        """Guarda el valor; si se indica la generación leída antes de ir a la base y hubo una invalidación, no lo guarda."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generacion is not None and generacion != self._generacion:
+                return
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_size:
+                self._datos.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *claves):
+        with self._lock:
+            self._generacion += 1
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._generacion += 1
+            self._datos.clear()
+
+    def stats(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "size": len(self._datos), "max_size": self.max_size, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / consultas, 4) if consultas else None,
+            }
+
+
+product_cache = LRUCache()
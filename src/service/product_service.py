@@ -1,64 +1,154 @@
-from database import get_connection
+import re
+from database import get_db, iter_chunks
+from service.pagination import paginate, build_page
+from service.projection import select_columns
+from service.product_cache import product_cache
+from service.change_service import row_version
+from models import Product
+
+PRODUCT_KEYS = ("id",)
+PRODUCT_COLUMNS = ("id", "nombre", "descripcion", "precio", "categoria", "stock", "registro", "url_origen")
+
+# Pesos BM25 por columna del índice FTS: el nombre pesa más que la descripción
+BM25_PESOS = (10.0, 1.0)
 
 # Crear producto
 def create_product(nombre, descripcion, precio, categoria, stock):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO productos (nombre, descripcion, precio, categoria, stock)
-            VALUES (?, ?, ?, ?, ?)
-        """, (nombre, descripcion, precio, categoria, stock))
-        conn.commit()
-        new_id = cursor.lastrowid
-        return get_product_by_id(new_id)
+        with get_db() as conn:
+            cursor = conn.execute("""
+                INSERT INTO productos (nombre, descripcion, precio, categoria, stock)
+                VALUES (?, ?, ?, ?, ?)
+            """, (nombre, descripcion, precio, categoria, stock))
+            # Se relee en la misma conexión (RETURNING devolvería los REAL enteros como int)
+            producto = Product.bind(conn.execute("SELECT * FROM productos WHERE id = ?", (cursor.lastrowid,))).fetchone()
+            version = row_version("productos", producto.id, conn)
+        product_cache.put(producto.id, (producto, version))
+        return {"success": True, "data": producto}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+def _products_query(nombre=None, categoria=None, campos=None):
+    query = f"SELECT {select_columns(campos, PRODUCT_COLUMNS, PRODUCT_KEYS)} FROM productos WHERE 1=1"
+    params = []
+    if nombre:
+        query += " AND nombre LIKE ?"
+        params.append(f"%{nombre}%")
+    if categoria:
+        query += " AND categoria = ?"
+        params.append(categoria)
+    return query, params
+
+# Carga masiva: inserta o actualiza por url_origen en una sola transacción
+UPSERT_PRODUCTO = """
+    INSERT INTO productos (nombre, descripcion, precio, categoria, stock, url_origen)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (url_origen) WHERE url_origen IS NOT NULL DO UPDATE SET
+        nombre = excluded.nombre,
+        descripcion = excluded.descripcion,
+        precio = excluded.precio,
+        categoria = excluded.categoria
+"""
+
+def upsert_products(productos, stock_inicial=10):
+    """
+    Importa un lote de productos (dicts con nombre, precio, categoria y opcionalmente
+    descripcion, stock y url_origen). Los que ya existen con la misma url_origen se
+    actualizan conservando su stock; el resto se inserta con stock_inicial.
+    """
+    try:
+        filas = []
+        for p in productos:
+            if not p.get("nombre") or p.get("precio") is None or not p.get("categoria"):
+                return {"success": False, "message": f"Producto incompleto en el lote: {p.get('nombre') or p}"}
+            filas.append((p["nombre"], p.get("descripcion", ""), p["precio"], p["categoria"],
+                          p.get("stock", stock_inicial), p.get("url_origen")))
+        if not filas:
+            return {"success": True, "insertados": 0, "actualizados": 0}
+        with get_db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM productos").fetchone()[0]
+            conn.executemany(UPSERT_PRODUCTO, filas)
+            insertados = conn.execute("SELECT COUNT(*) FROM productos WHERE id > ?", (ultimo_id,)).fetchone()[0]
+        # Los actualizados no se identifican por id: se vacía la caché completa
+        product_cache.clear()
+        return {"success": True, "insertados": insertados, "actualizados": len(filas) - insertados}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 # Listar productos
-def get_products(nombre=None, categoria=None):
+def get_products(nombre=None, categoria=None, limit=None, after=None, campos=None):
+    try:
+        query, params = _products_query(nombre, categoria, campos)
+        query, params = paginate(query, params, PRODUCT_KEYS, limit, after)
+        with get_db() as conn:
+            rows = Product.bind(conn.execute(query, params)).fetchall()
+        rows, next_cursor = build_page(rows, PRODUCT_KEYS, limit)
+        return {"success": True, "data": rows, "next_cursor": next_cursor}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+# Recorrer productos por bloques (respuestas en streaming)
+def stream_products(nombre=None, categoria=None, after=None, campos=None):
+    try:
+        query, params = _products_query(nombre, categoria, campos)
+        query, params = paginate(query, params, PRODUCT_KEYS, after=after)
+        return {"success": True, "data": iter_chunks(query, params, model=Product)}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+def _fts_query(texto):
+    """Convierte el texto del usuario en una consulta FTS5 segura: cada palabra como prefijo."""
+    palabras = re.findall(r"\w+", texto or "")
+    return " ".join(f'"{p}"*' for p in palabras)
+
+# Búsqueda de texto completo con ranking BM25
+def search_products(texto, limit=20, campos=None):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        query = "SELECT * FROM productos WHERE 1=1"
-        params = []
-        if nombre:
-            query += " AND nombre LIKE ?"
-            params.append(f"%{nombre}%")
-        if categoria:
-            query += " AND categoria = ?"
-            params.append(categoria)
-        cursor.execute(query, tuple(params))
-        rows = cursor.fetchall()
-        productos = [dict(row) for row in rows]
-        return {"success": True, "data": productos}
+        consulta = _fts_query(texto)
+        if not consulta:
+            return {"success": True, "data": []}
+        columnas = select_columns(campos, PRODUCT_COLUMNS, prefijo="p.")
+        with get_db() as conn:
+            rows = Product.bind(conn.execute(f"""
+                SELECT {columnas} FROM productos_fts
+                JOIN productos p ON p.id = productos_fts.rowid
+                WHERE productos_fts MATCH ?
+                ORDER BY bm25(productos_fts, {BM25_PESOS[0]}, {BM25_PESOS[1]})
+                LIMIT ?
+            """, (consulta, limit))).fetchall()
+        return {"success": True, "data": rows}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 # Obtener por ID
 def get_product_by_id(product_id):
+    """
+    Producto por id junto con su versión (seq, fecha) del registro de cambios, para ETag/Last-Modified.
+    La caché guarda ambos: un acierto no consulta la base.
+    """
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM productos WHERE id = ?", (product_id,))
-        row = cursor.fetchone()
-        if row:
-            return {"success": True, "data": dict(row)}
+        # Los modelos son inmutables: la entrada de la caché se entrega sin copiarla
+        entrada = product_cache.get(product_id)
+        if entrada is not None:
+            producto, version = entrada
+            return {"success": True, "data": producto, "version": version}
+        generacion = product_cache.generation()
+        with get_db() as conn:
+            # Fila y versión del mismo snapshot
+            conn.execute("BEGIN")
+            producto = Product.bind(conn.execute("SELECT * FROM productos WHERE id = ?", (product_id,))).fetchone()
+            version = row_version("productos", product_id, conn) if producto else None
+        if producto:
+            product_cache.put(product_id, (producto, version), generacion)
+            return {"success": True, "data": producto, "version": version}
         return {"success": False, "message": "Producto no encontrado"}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 # Actualizar producto
 def update_product(product_id, nombre=None, descripcion=None, precio=None, categoria=None, stock=None):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
         updates, params = [], []
         if nombre: updates.append("nombre=?"); params.append(nombre)
         if descripcion is not None: updates.append("descripcion=?"); params.append(descripcion)
@@ -69,27 +159,23 @@ def update_product(product_id, nombre=None, descripcion=None, precio=None, categ
             return {"success": False, "message": "No se proporcionaron campos para actualizar"}
         params.append(product_id)
         query = f"UPDATE productos SET {', '.join(updates)} WHERE id=?"
-        cursor.execute(query, tuple(params))
-        conn.commit()
+        with get_db() as conn:
+            cursor = conn.execute(query, tuple(params))
+        product_cache.invalidate(product_id)
         if cursor.rowcount == 0:
             return {"success": False, "message": "Producto no encontrado"}
         return {"success": True, "message": "Producto actualizado correctamente"}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 # Eliminar producto
 def delete_product(product_id):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM productos WHERE id=?", (product_id,))
-        conn.commit()
+        with get_db() as conn:
+            cursor = conn.execute("DELETE FROM productos WHERE id=?", (product_id,))
+        product_cache.invalidate(product_id)
         if cursor.rowcount == 0:
             return {"success": False, "message": "Producto no encontrado"}
         return {"success": True, "message": "Producto eliminado correctamente"}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
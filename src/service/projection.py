@@ -0,0 +1,19 @@
+# service/projection.py
+# Proyección de columnas: los servicios seleccionan solo los campos pedidos por la ruta
+# (parámetro fields= o proyección propia de la ruta) en lugar de SELECT *.
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def select_columns(campos, permitidas, claves=(), prefijo=""):
+    """
+    Lista de columnas para el SELECT. campos=None equivale a todas las permitidas.
+    Las columnas de `claves` (orden/cursor) se agregan siempre aunque no se hayan pedido.
+    """
+    campos = permitidas if campos is None else campos
+    desconocidos = [c for c in campos if c not in permitidas]
+    if desconocidos:
+        raise InvalidFields(f"Campos desconocidos: {', '.join(desconocidos)}")
+    return ", ".join(f"{prefijo}{c}" for c in dict.fromkeys([*claves, *campos]))
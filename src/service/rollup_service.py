@@ -0,0 +1,58 @@
+# service/rollup_service.py
+# Lecturas sobre sales_rollup: cuestan O(buckets) en lugar de O(ventas).
+# Recalcular desde cero: flask --app app rebuild-rollups
+from database import get_db, ROLLUP_DIMENSIONES, ROLLUP_REBUILD
+
+DIMENSIONES = tuple(dim for dim, _ in ROLLUP_DIMENSIONES)
+# Dimensiones cuya clave es un id entero: los límites de la query string se convierten antes de comparar
+CLAVES_ENTERAS = ("producto", "usuario")
+ORDENES = {
+    "clave": "clave",
+    "ingresos": "ingresos DESC, clave",
+    "unidades": "unidades DESC, clave",
+    "ventas": "ventas DESC, clave",
+}
+
+
+def get_rollup(dimension, desde=None, hasta=None, orden="clave", limit=None):
+    """
+    Totales de ventas por la dimensión pedida (dia, mes, producto, categoria, usuario).
+    desde/hasta filtran por clave (inclusive), útil para rangos de días o meses.
+    """
+    try:
+        if dimension not in DIMENSIONES:
+            return {"success": False, "message": f"Dimensión inválida, use una de: {', '.join(DIMENSIONES)}"}
+        if orden not in ORDENES:
+            return {"success": False, "message": f"Orden inválido, use uno de: {', '.join(ORDENES)}"}
+        if dimension in CLAVES_ENTERAS:
+            try:
+                desde, hasta = (None if v is None else int(v) for v in (desde, hasta))
+            except ValueError:
+                return {"success": False, "message": f"desde y hasta deben ser enteros para la dimensión {dimension}"}
+        # Buckets vaciados por borrados de ventas quedan en 0 y no se listan
+        query = "SELECT clave, ventas, unidades, ingresos FROM sales_rollup WHERE dimension=? AND ventas <> 0"
+        params = [dimension]
+        if desde is not None:
+            query += " AND clave >= ?"; params.append(desde)
+        if hasta is not None:
+            query += " AND clave <= ?"; params.append(hasta)
+        query += f" ORDER BY {ORDENES[orden]}"
+        if limit is not None:
+            query += " LIMIT ?"; params.append(limit)
+        with get_db() as conn:
+            rows = conn.execute(query, tuple(params)).fetchall()
+        return {"success": True, "data": [dict(row) for row in rows]}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def rebuild_rollups():
+    """Recalcula sales_rollup desde cero (backfill o verificación de los triggers)."""
+    try:
+        with get_db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql in ROLLUP_REBUILD:
+                conn.execute(sql)
+        return {"success": True, "message": "Rollups de ventas recalculados"}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
@@ -1,97 +1,262 @@
-from database import get_connection
-from datetime import datetime
-import openpyxl
-import os
+from database import get_db, iter_chunks
+from service.pagination import paginate, build_page
+from service.projection import select_columns
+from service.product_cache import product_cache
+from models import Sale
 
 # service/sales_services.py
 
-def create_sale(product_id, cantidad, total, user_id):
-    from database import get_connection
+# Orden estable de ventas: coincide con los índices (user_id, fecha), (product_id, fecha) y (fecha)
+SALE_KEYS = ("fecha", "id")
+SALE_COLUMNS = ("id", "user_id", "product_id", "cantidad", "total", "fecha")
+
+# Descuenta stock solo si alcanza; devuelve el precio o nada si no hay stock suficiente
+DESCONTAR_STOCK = (
+    "UPDATE productos SET stock = stock - ? WHERE id=? AND stock >= ? "
+    "RETURNING CAST(precio AS REAL) AS precio"
+)
+
+# RETURNING entrega los REAL enteros como int, por eso se castea el total
+VENTA_RETURNING = "RETURNING id, user_id, product_id, cantidad, CAST(total AS REAL) AS total, fecha"
+
+
+def _error(message, status):
+    return {"success": False, "message": message, "status": status}
+
+
+def _stock_error(conn, product_id, message_not_found="Producto no encontrado"):
+    existe = conn.execute("SELECT 1 FROM productos WHERE id=?", (product_id,)).fetchone()
+    if existe:
+        return _error("Stock insuficiente", 400)
+    return _error(message_not_found, 404)
+
+
+def create_sale(user_id, product_id, cantidad):
+    """
+    Registra la venta y descuenta el stock en una sola transacción (BEGIN IMMEDIATE).
+    El descuento es condicional, por lo que dos compras concurrentes no pueden sobrevender.
+    """
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO sales (user_id, product_id, cantidad, total) VALUES (?, ?, ?, ?)",
-            (user_id, product_id, cantidad, total)
-        )
-        conn.commit()
-        sale_id = cursor.lastrowid
-        cursor.execute("SELECT * FROM sales WHERE id = ?", (sale_id,))
-        venta = dict(cursor.fetchone())
+        error = _validar_linea({"user_id": user_id, "product_id": product_id, "cantidad": cantidad})
+        if error:
+            return _error(error, 400)
+        with get_db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            producto = conn.execute(DESCONTAR_STOCK, (cantidad, product_id, cantidad)).fetchone()
+            if producto is None:
+                return _stock_error(conn, product_id)
+            venta = Sale.bind(conn.execute(
+                f"INSERT INTO sales (user_id, product_id, cantidad, total) VALUES (?, ?, ?, ?) {VENTA_RETURNING}",
+                (user_id, product_id, cantidad, producto["precio"] * cantidad)
+            )).fetchone()
+        product_cache.invalidate(product_id)
         return {"success": True, "data": venta}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 
-def get_sales(user_id=None, product_id=None):
-    from database import get_connection
+MAX_LINEAS_LOTE = 500
+
+
+def _es_entero(valor):
+    # bool es subclase de int: un true de JSON no debe pasar por id ni por cantidad 1
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _validar_linea(linea):
+    for campo in ("user_id", "product_id", "cantidad"):
+        if not isinstance(linea, dict) or not _es_entero(linea.get(campo)):
+            return f"Falta el campo {campo} o no es entero"
+    if linea["cantidad"] <= 0:
+        return "La cantidad debe ser mayor a cero"
+    return None
+
+
+def create_sales_batch(lineas):
+    """
+    Registra varias líneas de venta en una sola transacción.
+    Precios y stock se leen con una única consulta IN (...); si alguna línea falla no se guarda ninguna.
+    """
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        query = "SELECT * FROM sales WHERE 1=1"
-        params = []
-        if user_id:
-            query += " AND user_id=?"
-            params.append(user_id)
-        if product_id:
-            query += " AND product_id=?"
-            params.append(product_id)
-        cursor.execute(query, tuple(params))
-        ventas = [dict(row) for row in cursor.fetchall()]
-        return {"success": True, "data": ventas}
+        if not lineas:
+            return _error("No se enviaron líneas de venta", 400)
+        if len(lineas) > MAX_LINEAS_LOTE:
+            return _error(f"El lote admite como máximo {MAX_LINEAS_LOTE} líneas", 400)
+
+        errores = [_validar_linea(linea) for linea in lineas]
+        if any(errores):
+            resultados = [{"linea": i, "success": not err, "message": err or "OK"} for i, err in enumerate(errores)]
+            return {"success": False, "message": "Lote inválido", "status": 400, "lineas": resultados}
+
+        # Cantidad total pedida por producto (un carrito puede repetir productos)
+        pedido = {}
+        for linea in lineas:
+            pedido[linea["product_id"]] = pedido.get(linea["product_id"], 0) + linea["cantidad"]
+
+        with get_db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            marcadores = ", ".join("?" * len(pedido))
+            productos = {
+                row["id"]: row for row in conn.execute(
+                    f"SELECT id, precio, stock FROM productos WHERE id IN ({marcadores})", tuple(pedido)
+                )
+            }
+
+            resultados, valido = [], True
+            for i, linea in enumerate(lineas):
+                producto = productos.get(linea["product_id"])
+                if producto is None:
+                    resultados.append({"linea": i, "success": False, "message": "Producto no encontrado"})
+                    valido = False
+                elif producto["stock"] < pedido[linea["product_id"]]:
+                    resultados.append({"linea": i, "success": False, "message": "Stock insuficiente"})
+                    valido = False
+                else:
+                    resultados.append({"linea": i, "success": True, "message": "OK"})
+            if not valido:
+                conn.rollback()
+                return {"success": False, "message": "No se registró ninguna venta del lote",
+                        "status": 400, "lineas": resultados}
+
+            # Con el lock de escritura tomado, las filas con id mayor al actual son las de este lote
+            ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM sales").fetchone()[0]
+            conn.executemany(
+                "UPDATE productos SET stock = stock - ? WHERE id=?",
+                [(cantidad, product_id) for product_id, cantidad in pedido.items()]
+            )
+            conn.executemany(
+                "INSERT INTO sales (user_id, product_id, cantidad, total) VALUES (?, ?, ?, ?)",
+                [(l["user_id"], l["product_id"], l["cantidad"], productos[l["product_id"]]["precio"] * l["cantidad"])
+                 for l in lineas]
+            )
+            ventas = Sale.bind(conn.execute("SELECT * FROM sales WHERE id > ? ORDER BY id", (ultimo_id,))).fetchall()
+        product_cache.invalidate(*pedido)
+
+        for resultado, venta in zip(resultados, ventas):
+            resultado["data"] = venta
+        return {"success": True, "lineas": resultados}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 
-def get_sale_by_id(sale_id):
-    from database import get_connection
+def _sales_query(user_id=None, product_id=None, campos=None):
+    query = f"SELECT {select_columns(campos, SALE_COLUMNS, SALE_KEYS)} FROM sales WHERE 1=1"
+    params = []
+    if user_id:
+        query += " AND user_id=?"
+        params.append(user_id)
+    if product_id:
+        query += " AND product_id=?"
+        params.append(product_id)
+    return query, params
+
+
+def get_sales(user_id=None, product_id=None, limit=None, after=None, campos=None):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM sales WHERE id=?", (sale_id,))
-        row = cursor.fetchone()
+        query, params = _sales_query(user_id, product_id, campos)
+        query, params = paginate(query, params, SALE_KEYS, limit, after)
+        with get_db() as conn:
+            rows = Sale.bind(conn.execute(query, params)).fetchall()
+        rows, next_cursor = build_page(rows, SALE_KEYS, limit)
+        return {"success": True, "data": rows, "next_cursor": next_cursor}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def stream_sales(user_id=None, product_id=None, after=None, campos=None):
+    try:
+        query, params = _sales_query(user_id, product_id, campos)
+        query, params = paginate(query, params, SALE_KEYS, after=after)
+        return {"success": True, "data": iter_chunks(query, params, model=Sale)}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def month_range(año, mes):
+    """Límites [desde, hasta) del mes como texto comparable con la columna fecha."""
+    siguiente = (año + 1, 1) if mes == 12 else (año, mes + 1)
+    return f"{año:04d}-{mes:02d}-01", f"{siguiente[0]:04d}-{siguiente[1]:02d}-01"
+
+
+def stream_sales_between(desde, hasta):
+    """Ventas con desde <= fecha < hasta, recorridas por bloques sobre idx_sales_fecha."""
+    try:
+        query = "SELECT * FROM sales WHERE fecha >= ? AND fecha < ? ORDER BY fecha, id"
+        return {"success": True, "data": iter_chunks(query, (desde, hasta), model=Sale)}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def get_daily_totals(desde, hasta):
+    """Ventas, unidades e ingresos por día en el rango, agregados en SQLite."""
+    try:
+        with get_db() as conn:
+            rows = conn.execute("""
+                SELECT substr(fecha, 1, 10) AS dia, COUNT(*) AS ventas,
+                       SUM(cantidad) AS unidades, SUM(total) AS ingresos
+                FROM sales WHERE fecha >= ? AND fecha < ?
+                GROUP BY dia ORDER BY dia
+            """, (desde, hasta)).fetchall()
+        return {"success": True, "data": [dict(row) for row in rows]}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def get_sale_by_id(sale_id, campos=None):
+    try:
+        with get_db() as conn:
+            row = Sale.bind(conn.execute(
+                f"SELECT {select_columns(campos, SALE_COLUMNS)} FROM sales WHERE id=?", (sale_id,)
+            )).fetchone()
         if row:
-            return {"success": True, "data": dict(row)}
+            return {"success": True, "data": row}
         return {"success": False, "message": "Venta no encontrada"}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 
-def update_sale(sale_id, cantidad, total):
-    from database import get_connection
+def update_sale(sale_id, cantidad=None, total=None):
+    """Cambia la cantidad de una venta y ajusta el stock por la diferencia, todo en una transacción."""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE sales SET cantidad=?, total=? WHERE id=?",
-            (cantidad, total, sale_id)
-        )
-        conn.commit()
-        cursor.execute("SELECT * FROM sales WHERE id=?", (sale_id,))
-        return {"success": True, "data": dict(cursor.fetchone())}
+        if cantidad is not None and cantidad <= 0:
+            return _error("La cantidad debe ser mayor a cero", 400)
+        with get_db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            venta = conn.execute("SELECT product_id, cantidad FROM sales WHERE id=?", (sale_id,)).fetchone()
+            if venta is None:
+                return _error("Venta no encontrada", 404)
+            nueva_cantidad = venta["cantidad"] if cantidad is None else cantidad
+            diferencia = nueva_cantidad - venta["cantidad"]
+            producto = conn.execute(DESCONTAR_STOCK, (diferencia, venta["product_id"], diferencia)).fetchone()
+            if producto is None:
+                return _stock_error(conn, venta["product_id"], "Producto de la venta no encontrado")
+            if total is None:
+                total = producto["precio"] * nueva_cantidad
+            actualizada = Sale.bind(conn.execute(
+                f"UPDATE sales SET cantidad=?, total=? WHERE id=? {VENTA_RETURNING}",
+                (nueva_cantidad, total, sale_id)
+            )).fetchone()
+        product_cache.invalidate(venta["product_id"])
+        return {"success": True, "data": actualizada}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 
 def delete_sale(sale_id):
-    from database import get_connection
+    """Elimina la venta y devuelve su cantidad al stock del producto en la misma transacción."""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM sales WHERE id=?", (sale_id,))
-        conn.commit()
-        if cursor.rowcount:
-            return {"success": True, "message": "Venta eliminada"}
-        return {"success": False, "message": "Venta no encontrada"}
+        with get_db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            venta = conn.execute(
+                "DELETE FROM sales WHERE id=? RETURNING product_id, cantidad", (sale_id,)
+            ).fetchone()
+            if venta is None:
+                return _error("Venta no encontrada", 404)
+            conn.execute(
+                "UPDATE productos SET stock = stock + ? WHERE id=?",
+                (venta["cantidad"], venta["product_id"])
+            )
+        product_cache.invalidate(venta["product_id"])
+        return {"success": True, "message": "Venta eliminada"}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
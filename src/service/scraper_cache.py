@@ -0,0 +1,135 @@
+# service/scraper_cache.py
+# Caché en disco para el scraper: respuestas HTTP (con ETag/Last-Modified para revalidar)
+# y resultados ya parseados indexados por el hash del contenido.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.getenv("SCRAPER_CACHE", os.path.join(BASE_DIR, "scraper_cache.db"))
+CACHE_MAX_BYTES = int(float(os.getenv("SCRAPER_CACHE_MAX_MB", 200)) * 1024 * 1024)
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+class ScraperCache:
+    """Caché LRU acotada por tamaño total, guardada en un archivo SQLite propio."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS parsed_cache (
+                hash TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (hash, kind)
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_http_cache_accessed ON http_cache (accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parsed_cache_accessed ON parsed_cache (accessed)")
+
+    # -------- respuestas HTTP --------
+    def get_response(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body, hash FROM http_cache WHERE url=?", (url,)
+            ).fetchone()
+            if row:
+                self._conn.execute("UPDATE http_cache SET accessed=? WHERE url=?", (time.time(), url))
+                return {"etag": row[0], "last_modified": row[1], "body": row[2], "hash": row[3]}
+            return None
+
+    def put_response(self, url, etag, last_modified, body, hash_):
+        size = len(body.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body, hash, size, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, hash_, size, time.time())
+            )
+            self._evict()
+
+    # -------- resultados parseados --------
+    def get_parsed(self, hash_, kind):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM parsed_cache WHERE hash=? AND kind=?", (hash_, kind)
+            ).fetchone()
+            if row:
+                self._conn.execute(
+                    "UPDATE parsed_cache SET accessed=? WHERE hash=? AND kind=?", (time.time(), hash_, kind)
+                )
+                return json.loads(row[0])
+            return None
+
+    def put_parsed(self, hash_, kind, data):
+        texto = json.dumps(data, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parsed_cache (hash, kind, data, size, accessed) VALUES (?, ?, ?, ?, ?)",
+                (hash_, kind, texto, len(texto.encode("utf-8")), time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        """Elimina las entradas usadas hace más tiempo hasta volver bajo max_bytes."""
+        total = self._conn.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM http_cache) + (SELECT COALESCE(SUM(size), 0) FROM parsed_cache)"
+        ).fetchone()[0]
+        while total > self.max_bytes:
+            candidatos = self._conn.execute('''
+                SELECT 'http' AS tabla, url AS clave, NULL AS kind, size, accessed FROM http_cache
+                UNION ALL
+                SELECT 'parsed', hash, kind, size, accessed FROM parsed_cache
+                ORDER BY accessed LIMIT 50
+            ''').fetchall()
+            if not candidatos:
+                break
+            for tabla, clave, kind, size, _ in candidatos:
+                if tabla == "http":
+                    self._conn.execute("DELETE FROM http_cache WHERE url=?", (clave,))
+                else:
+                    self._conn.execute("DELETE FROM parsed_cache WHERE hash=? AND kind=?", (clave, kind))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM http_cache")
+            self._conn.execute("DELETE FROM parsed_cache")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ScraperCache()
+        return _cache
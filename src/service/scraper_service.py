@@ -1,7 +1,17 @@
 # service/scraper_service.py
+import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import closing
+from itertools import islice
+from urllib.parse import urljoin, urlparse, urlencode, parse_qsl, urlunparse
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from service.product_service import upsert_products
+from service.scraper_cache import get_cache, content_hash
+from service.html_backends import get_backend, subarboles
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -9,6 +19,114 @@ HEADERS = {
                   "Chrome/120.0.0.0 Safari/537.36"
 }
 
+# Concurrencia del scraping por lotes
+MAX_WORKERS = 8
+MAX_POR_HOST = 4
+IMPORT_CHUNK = 200  # productos por transacción al volcar resultados en la base
+
+# Límites de una importación: cada página es una descarga que hace el servidor
+MAX_PAGINAS = int(os.getenv("SCRAPER_MAX_PAGINAS", 20))
+MAX_URLS = int(os.getenv("SCRAPER_MAX_URLS", 200))
+MAX_REDIRECCIONES = 5
+
+# Solo se descargan páginas http(s) de estos hosts (lista separada por comas)
+ALLOWED_HOSTS = {h.strip().lower() for h in os.getenv("SCRAPER_ALLOWED_HOSTS", "webscraper.io").split(",") if h.strip()}
+
+LISTADO_POR_DEFECTO = "https://webscraper.io/test-sites/e-commerce/static/computers/laptops"
+
+_session = None
+_session_lock = threading.Lock()
+_host_locks = {}
+
+
+def get_session():
+    """Sesión compartida con keep-alive, pool de conexiones y reintentos con backoff."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=("GET",))
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=retry)
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _host_semaphore(url):
+    host = urlparse(url).netloc
+    with _session_lock:
+        if host not in _host_locks:
+            _host_locks[host] = threading.BoundedSemaphore(MAX_POR_HOST)
+        return _host_locks[host]
+
+
+class URLNotAllowed(ValueError):
+    pass
+
+
+def check_url(url):
+    """Rechaza lo que no sea http(s) hacia uno de los hosts permitidos (ALLOWED_HOSTS)."""
+    partes = urlparse(url) if isinstance(url, str) else None
+    if partes is None or partes.scheme not in ("http", "https") or (partes.hostname or "") not in ALLOWED_HOSTS:
+        raise URLNotAllowed(f"URL no permitida: {url}")
+    return url
+
+
+def fetch(url, timeout=8, headers=None):
+    """
+    GET respetando el límite de peticiones simultáneas por host.
+    Las redirecciones se siguen a mano para validar también cada destino.
+    """
+    for _ in range(MAX_REDIRECCIONES + 1):
+        check_url(url)
+        with _host_semaphore(url):
+            resp = get_session().get(url, timeout=timeout, headers=headers, allow_redirects=False)
+        if not resp.is_redirect:
+            return resp
+        url = urljoin(url, resp.headers["Location"])
+    raise requests.exceptions.TooManyRedirects(f"Más de {MAX_REDIRECCIONES} redirecciones")
+
+
+def download(url, timeout=8):
+    """
+    Descarga la página usando la caché en disco: si hay copia se revalida con
+    If-None-Match / If-Modified-Since y un 304 reutiliza el cuerpo guardado.
+    Retorna {"success": True, "body": str, "hash": str} o {"success": False, "message": ...}.
+    """
+    cache = get_cache()
+    guardada = cache.get_response(url)
+    headers = {}
+    if guardada:
+        if guardada["etag"]:
+            headers["If-None-Match"] = guardada["etag"]
+        if guardada["last_modified"]:
+            headers["If-Modified-Since"] = guardada["last_modified"]
+
+    resp = fetch(url, timeout=timeout, headers=headers)
+    if resp.status_code == 304 and guardada:
+        return {"success": True, "body": guardada["body"], "hash": guardada["hash"]}
+    if resp.status_code != 200:
+        return {"success": False, "message": f"Status {resp.status_code} al acceder a {url}"}
+
+    hash_ = content_hash(resp.content)
+    cache.put_response(url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), resp.text, hash_)
+    return {"success": True, "body": resp.text, "hash": hash_}
+
+
+def _parse_cached(descarga, kind, parser):
+    """Reutiliza el resultado parseado si ya se vio un cuerpo idéntico (mismo hash)."""
+    cache = get_cache()
+    resultado = cache.get_parsed(descarga["hash"], kind)
+    if resultado is None:
+        resultado = parser(descarga["body"])
+        if resultado["success"]:
+            cache.put_parsed(descarga["hash"], kind, resultado)
+    return resultado
+
+
 def _parse_price(text):
     if not text:
         return None
@@ -20,90 +138,268 @@ def _parse_price(text):
     except:
         return None
 
+# Selectores por campo, en orden de prioridad
+SELECTORS_NAME = [
+    "h1#title", "h1.product-title", "h1", "span#productTitle", "div.product-name h1"
+]
+SELECTORS_PRICE = [
+    "span#priceblock_ourprice", "span#priceblock_dealprice",
+    "span.price", "div.price", "span.product-price", "p.price"
+]
+SELECTORS_DESC = [
+    "div#productDescription", "div.product-description", "div.description",
+    "div#description", "section.product-description", "meta[name='description']"
+]
+SELECTORS_CAT = [
+    "ul.breadcrumb li a", "nav.breadcrumb a", "div.breadcrumb a", "span.category"
+]
+SELECTORS_LISTING = [".thumbnail"]
+
+# Con BeautifulSoup solo se construyen los subárboles que alguno de los selectores puede tocar
+SUBARBOLES_PRODUCTO = subarboles(SELECTORS_NAME + SELECTORS_PRICE + SELECTORS_DESC + SELECTORS_CAT)
+SUBARBOLES_LISTADO = subarboles(SELECTORS_LISTING)
+
+def parse_product_page(html, backend=None):
+    """Extrae nombre, precio, descripcion y categoria del HTML de una página de producto."""
+    bk = get_backend(backend)
+    doc = bk.parse(html, SUBARBOLES_PRODUCTO)
+
+    # 1) Nombre: intentar selectores comunes
+    nombre = None
+    for sel in SELECTORS_NAME:
+        el = bk.first(doc, sel)
+        if el is not None and bk.text(el):
+            nombre = bk.text(el)
+            break
+
+    # 2) Precio: selectores comunes
+    precio = None
+    for sel in SELECTORS_PRICE:
+        el = bk.first(doc, sel)
+        if el is not None and bk.text(el):
+            precio = _parse_price(bk.text(el))
+            if precio is not None:
+                break
+
+    # 3) Descripción: intentos múltiples
+    descripcion = None
+    for sel in SELECTORS_DESC:
+        el = bk.first(doc, sel)
+        if el is not None:
+            if bk.tag(el) == "meta":
+                descripcion = (bk.attr(el, "content") or "").strip()
+            else:
+                descripcion = bk.text(el, " ")
+            if descripcion:
+                break
+
+    # 4) Categoria (breadcrumb)
+    categoria = None
+    for sel in SELECTORS_CAT:
+        nodes = bk.all(doc, sel)
+        if nodes:
+            # tomar el último texto visible como categoria
+            categoria = bk.text(nodes[-1])
+            if categoria:
+                break
+
+    # Garantizar valores por defecto
+    if not nombre:
+        return {"success": False, "message": "No se pudo extraer el nombre del producto (selector no encontrado)."}
+    if precio is None:
+        # precio opcional: puedes decidir fallar o setear 0.0; aquí devolvemos success pero precio null
+        precio = 0.0
+
+    # Limpiar strings largos
+    if descripcion and len(descripcion) > 2000:
+        descripcion = descripcion[:2000] + "..."
+
+    return {"success": True, "data": {
+        "nombre": nombre,
+        "precio": precio,
+        "descripcion": descripcion or "",
+        "categoria": categoria or "Sin categoría",
+        # stock lo dejamos para crear producto con un valor por defecto (p. ej. 10)
+    }}
+
 def scrape_product_page(url, timeout=8):
     """
     Intenta obtener nombre, precio, descripcion, categoria desde una página de producto.
     Retorna dict: {"success": True, "data": {...}} o {"success": False, "message": "..."}
     """
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=timeout)
-        if resp.status_code != 200:
-            return {"success": False, "message": f"Status {resp.status_code} al acceder a {url}"}
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        # 1) Nombre: intentar selectores comunes
-        nombre = None
-        selectors_name = [
-            "h1#title", "h1.product-title", "h1", "span#productTitle", "div.product-name h1"
-        ]
-        for sel in selectors_name:
-            el = soup.select_one(sel)
-            if el and el.get_text(strip=True):
-                nombre = el.get_text(strip=True)
-                break
-
-        # 2) Precio: selectores comunes
-        precio = None
-        selectors_price = [
-            "span#priceblock_ourprice", "span#priceblock_dealprice",
-            "span.price", "div.price", "span.product-price", "p.price"
-        ]
-        for sel in selectors_price:
-            el = soup.select_one(sel)
-            if el and el.get_text(strip=True):
-                precio = _parse_price(el.get_text(strip=True))
-                if precio is not None:
-                    break
-
-        # 3) Descripción: intentos múltiples
-        descripcion = None
-        selectors_desc = [
-            "div#productDescription", "div.product-description", "div.description",
-            "div#description", "section.product-description", "meta[name='description']"
-        ]
-        for sel in selectors_desc:
-            el = soup.select_one(sel)
-            if el:
-                if el.name == "meta":
-                    descripcion = el.get("content", "").strip()
-                else:
-                    descripcion = el.get_text(" ", strip=True)
-                if descripcion:
-                    break
-
-        # 4) Categoria (breadcrumb)
-        categoria = None
-        selectors_cat = [
-            "ul.breadcrumb li a", "nav.breadcrumb a", "div.breadcrumb a", "span.category"
-        ]
-        for sel in selectors_cat:
-            nodes = soup.select(sel)
-            if nodes:
-                # tomar el último texto visible como categoria
-                categoria = nodes[-1].get_text(strip=True)
-                if categoria:
-                    break
-
-        # Garantizar valores por defecto
-        if not nombre:
-            return {"success": False, "message": "No se pudo extraer el nombre del producto (selector no encontrado)."}
-        if precio is None:
-            # precio opcional: puedes decidir fallar o setear 0.0; aquí devolvemos success pero precio null
-            precio = 0.0
-
-        # Limpiar strings largos
-        if descripcion and len(descripcion) > 2000:
-            descripcion = descripcion[:2000] + "..."
-
-        return {"success": True, "data": {
-            "nombre": nombre,
-            "precio": precio,
-            "descripcion": descripcion or "",
-            "categoria": categoria or "Sin categoría",
-            # stock lo dejamos para crear producto con un valor por defecto (p. ej. 10)
-        }}
+        descarga = download(url, timeout=timeout)
+        if not descarga["success"]:
+            return descarga
+        return _parse_cached(descarga, "producto", parse_product_page)
 
+    except URLNotAllowed as e:
+        return {"success": False, "message": str(e)}
     except requests.exceptions.RequestException as re:
         return {"success": False, "message": f"Error de red al acceder a la URL: {re}"}
     except Exception as e:
         return {"success": False, "message": f"Error al parsear página: {e}"}
+
+
+def _en_paralelo(tarea, urls, max_workers):
+    """
+    Ejecuta tarea(url) en un pool con como mucho 2 * max_workers URLs encoladas a la vez
+    y entrega (url, resultado) en orden de llegada. Si el consumidor cierra el generador
+    (o falla), las descargas aún no empezadas se cancelan.
+    """
+    urls = iter(urls)
+    pendientes = {}
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def encolar():
+        for url in islice(urls, 2 * max_workers - len(pendientes)):
+            pendientes[pool.submit(tarea, url)] = url
+
+    try:
+        encolar()
+        while pendientes:
+            listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                yield pendientes.pop(futuro), futuro.result()
+            encolar()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def scrape_product_pages(urls, max_workers=MAX_WORKERS, timeout=8):
+    """
+    Descarga y parsea varias páginas de producto en paralelo.
+    Generador: entrega (url, resultado) a medida que cada página termina, en orden de llegada.
+    """
+    return _en_paralelo(lambda url: scrape_product_page(url, timeout), urls, max_workers)
+
+
+def parse_listing_page(html, base_url, categoria="Sin categoría", backend=None):
+    """Extrae los productos (tarjetas .thumbnail) de una página de listado."""
+    bk = get_backend(backend)
+    doc = bk.parse(html, SUBARBOLES_LISTADO)
+    productos = []
+    for item in bk.all(doc, SELECTORS_LISTING[0]):
+        titulo = bk.first(item, ".title")
+        precio = bk.first(item, ".price")
+        if titulo is None or precio is None:
+            continue
+        descripcion = bk.first(item, ".description")
+        href = bk.attr(titulo, "href")
+        productos.append({
+            "nombre": bk.text(titulo),
+            "descripcion": bk.text(descripcion) if descripcion is not None else "",
+            "precio": _parse_price(bk.text(precio)) or 0.0,
+            "categoria": categoria,
+            # La URL del detalle identifica al producto: reimportar actualiza en vez de duplicar
+            "url_origen": urljoin(base_url, href) if href else None,
+        })
+    return productos
+
+
+def listing_page_urls(url, paginas=1):
+    """Generador de las URLs de las primeras `paginas` páginas de un listado paginado con ?page=N."""
+    partes = urlparse(url)
+    query = dict(parse_qsl(partes.query))
+    yield url
+    for pagina in range(2, paginas + 1):
+        query["page"] = str(pagina)
+        yield urlunparse(partes._replace(query=urlencode(query)))
+
+
+def _scrape_listing(url, categoria, timeout):
+    try:
+        descarga = download(url, timeout=timeout)
+        if not descarga["success"]:
+            return descarga
+        # El resultado depende de la URL base (enlaces relativos) y de la categoría asignada
+        return _parse_cached(descarga, f"listado|{url}|{categoria}",
+                             lambda html: {"success": True, "data": parse_listing_page(html, url, categoria)})
+    except URLNotAllowed as e:
+        return {"success": False, "message": str(e)}
+    except requests.exceptions.RequestException as e:
+        return {"success": False, "message": f"Error de red al acceder a la URL: {e}"}
+    except Exception as e:
+        return {"success": False, "message": f"Error al parsear página: {e}"}
+
+
+def scrape_listing_pages(urls, categoria="Sin categoría", max_workers=MAX_WORKERS, timeout=10):
+    """Generador paralelo sobre páginas de listado: entrega (url, resultado) en orden de llegada."""
+    return _en_paralelo(lambda url: _scrape_listing(url, categoria, timeout), urls, max_workers)
+
+
+def _validar_importacion(urls, listing_url, paginas):
+    """Errores de los parámetros de import_products, antes de descargar nada."""
+    if urls:
+        if len(urls) > MAX_URLS:
+            return [{"url": None, "message": f"Como máximo {MAX_URLS} urls por importación"}]
+        candidatas = urls
+    else:
+        if isinstance(paginas, bool) or not isinstance(paginas, int) or not 1 <= paginas <= MAX_PAGINAS:
+            return [{"url": None, "message": f"paginas debe ser un entero entre 1 y {MAX_PAGINAS}"}]
+        candidatas = [listing_url or LISTADO_POR_DEFECTO]
+    errores = []
+    for url in candidatas:
+        try:
+            check_url(url)
+        except URLNotAllowed as e:
+            errores.append({"url": url, "message": str(e)})
+    return errores
+
+
+def import_products(urls=None, listing_url=None, paginas=1, categoria="Laptops"):
+    """
+    Importa productos desde páginas de producto (urls) o desde un listado paginado.
+    Los resultados se vuelcan en la base por bloques a medida que llegan.
+    """
+    errores = _validar_importacion(urls, listing_url, paginas)
+    if errores:
+        return {"success": False, "status": 400, "message": errores[0]["message"], "insertados": 0,
+                "actualizados": 0, "errores": errores}
+
+    nombres, lote = [], []
+    insertados = actualizados = 0
+
+    if urls:
+        def productos():
+            with closing(scrape_product_pages(urls)) as resultados:
+                for url, resultado in resultados:
+                    if resultado["success"]:
+                        yield dict(resultado["data"], url_origen=url)
+                    else:
+                        errores.append({"url": url, "message": resultado["message"]})
+    else:
+        def productos():
+            paginas_url = listing_page_urls(listing_url or LISTADO_POR_DEFECTO, paginas)
+            with closing(scrape_listing_pages(paginas_url, categoria)) as resultados:
+                for url, resultado in resultados:
+                    if resultado["success"]:
+                        yield from resultado["data"]
+                    else:
+                        errores.append({"url": url, "message": resultado["message"]})
+
+    def volcar():
+        nonlocal insertados, actualizados
+        resultado = upsert_products(lote)
+        if not resultado["success"]:
+            raise RuntimeError(resultado["message"])
+        insertados += resultado["insertados"]
+        actualizados += resultado["actualizados"]
+        nombres.extend(p["nombre"] for p in lote)
+        lote.clear()
+
+    try:
+        # closing(): si un volcado falla, el generador se cierra en el acto y cancela las descargas encoladas
+        with closing(productos()) as pendientes:
+            for producto in pendientes:
+                lote.append(producto)
+                if len(lote) >= IMPORT_CHUNK:
+                    volcar()
+        if lote:
+            volcar()
+    except Exception as e:
+        return {"success": False, "message": str(e), "insertados": insertados,
+                "actualizados": actualizados, "errores": errores}
+
+    return {"success": True, "insertados": insertados, "actualizados": actualizados,
+            "productos": nombres, "errores": errores}
@@ -1,85 +1,106 @@
-from database import get_connection
-from werkzeug.security import generate_password_hash, check_password_hash
+from database import get_db, iter_chunks
+from service.password_service import hash_password, verify_password, needs_rehash, HasherBusy
+from service.pagination import paginate, build_page
+from service.projection import select_columns
+from models import Usuario
+
+USER_KEYS = ("id",)
+# Columnas que se pueden pedir; clave_hash nunca sale del servicio
+USER_COLUMNS = ("id", "nombres", "apellidos", "edad", "telefono", "correo", "ciudad", "pais", "registro")
 
 # Crear usuario
 def create_user(nombres, apellidos, edad, telefono, correo, password, ciudad, pais):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        hashed_pw = generate_password_hash(password)
-        cursor.execute("""
-            INSERT INTO users (nombres, apellidos, edad, telefono, correo, clave_hash, ciudad, pais)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (nombres, apellidos, edad, telefono, correo, hashed_pw, ciudad, pais))
-        conn.commit()
-        new_id = cursor.lastrowid
+        hashed_pw = hash_password(password)
+        with get_db() as conn:
+            cursor = conn.execute("""
+                INSERT INTO users (nombres, apellidos, edad, telefono, correo, clave_hash, ciudad, pais)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (nombres, apellidos, edad, telefono, correo, hashed_pw, ciudad, pais))
+            new_id = cursor.lastrowid
         return get_user_by_id(new_id)
+    except HasherBusy as e:
+        return {"success": False, "message": str(e), "status": 503}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 # Verificar usuario (login)
 def verify_user(correo, password):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, clave_hash FROM users WHERE correo=?", (correo,))
-        user = cursor.fetchone()
-        if user and check_password_hash(user["clave_hash"], password):
+        with get_db() as conn:
+            user = conn.execute("SELECT id, clave_hash FROM users WHERE correo=?", (correo,)).fetchone()
+        if user and verify_password(user["clave_hash"], password):
+            _rehash(user["id"], user["clave_hash"], password)
             return {"success": True, "user_id": user["id"]}
         return {"success": False, "message": "Correo o contraseña incorrectos."}
+    except HasherBusy as e:
+        return {"success": False, "message": str(e), "status": 503}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
+
+def _rehash(user_id, clave_anterior, password):
+    """Actualiza el hash si tiene parámetros viejos; si el pool está saturado se deja para el próximo login."""
+    try:
+        if not needs_rehash(clave_anterior):
+            return
+        nuevo = hash_password(password)
+    except HasherBusy:
+        return
+    with get_db() as conn:
+        conn.execute("UPDATE users SET clave_hash=? WHERE id=? AND clave_hash=?", (nuevo, user_id, clave_anterior))
+
+def _users_query(pais=None, ciudad=None, edad_min=None, edad_max=None, correo=None, campos=None):
+    query = f"SELECT {select_columns(campos, USER_COLUMNS, USER_KEYS)} FROM users WHERE 1=1"
+    params = []
+    if pais:
+        query += " AND pais=?"; params.append(pais)
+    if ciudad:
+        query += " AND ciudad=?"; params.append(ciudad)
+    if edad_min is not None:
+        query += " AND edad>=?"; params.append(edad_min)
+    if edad_max is not None:
+        query += " AND edad<=?"; params.append(edad_max)
+    if correo is not None:
+        query += " AND correo=?"; params.append(correo)
+    return query, params
 
 # Obtener todos los usuarios con filtros opcionales
-def get_users(pais=None, ciudad=None, edad_min=None, edad_max=None, correo=None):
+def get_users(pais=None, ciudad=None, edad_min=None, edad_max=None, correo=None, limit=None, after=None, campos=None):
+    try:
+        query, params = _users_query(pais, ciudad, edad_min, edad_max, correo, campos)
+        query, params = paginate(query, params, USER_KEYS, limit, after)
+        with get_db() as conn:
+            rows = Usuario.bind(conn.execute(query, params)).fetchall()
+        rows, next_cursor = build_page(rows, USER_KEYS, limit)
+        return {"success": True, "data": rows, "next_cursor": next_cursor}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+# Recorrer usuarios por bloques (respuestas en streaming)
+def stream_users(pais=None, ciudad=None, edad_min=None, edad_max=None, correo=None, after=None, campos=None):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        query = "SELECT * FROM users WHERE 1=1"
-        params = []
-        if pais:
-            query += " AND pais=?"; params.append(pais)
-        if ciudad:
-            query += " AND ciudad=?"; params.append(ciudad)
-        if edad_min is not None:
-            query += " AND edad>=?"; params.append(edad_min)
-        if edad_max is not None:
-            query += " AND edad<=?"; params.append(edad_max)
-        if correo is not None:
-            query += " AND correo=?"; params.append(correo)
-        cursor.execute(query, tuple(params))
-        rows = cursor.fetchall()
-        users = [dict(row) for row in rows]
-        return {"success": True, "data": users}
+        query, params = _users_query(pais, ciudad, edad_min, edad_max, correo, campos)
+        query, params = paginate(query, params, USER_KEYS, after=after)
+        return {"success": True, "data": iter_chunks(query, params, model=Usuario)}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 # Obtener usuario por ID
-def get_user_by_id(user_id):
+def get_user_by_id(user_id, campos=None):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id=?", (user_id,))
-        row = cursor.fetchone()
+        with get_db() as conn:
+            row = Usuario.bind(conn.execute(
+                f"SELECT {select_columns(campos, USER_COLUMNS)} FROM users WHERE id=?", (user_id,)
+            )).fetchone()
         if row:
-            return {"success": True, "data": dict(row)}
+            return {"success": True, "data": row}
         return {"success": False, "message": "Usuario no encontrado"}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 # Actualizar usuario
 def update_user(user_id, nombres=None, apellidos=None, edad=None, telefono=None, correo=None, ciudad=None, pais=None):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
         updates, params = [], []
         if nombres: updates.append("nombres=?"); params.append(nombres)
         if apellidos: updates.append("apellidos=?"); params.append(apellidos)
@@ -92,27 +113,21 @@ def update_user(user_id, nombres=None, apellidos=None, edad=None, telefono=None,
             return {"success": False, "message": "No se proporcionaron campos para actualizar"}
         params.append(user_id)
         query = f"UPDATE users SET {', '.join(updates)} WHERE id=?"
-        cursor.execute(query, tuple(params))
-        conn.commit()
+        with get_db() as conn:
+            cursor = conn.execute(query, tuple(params))
         if cursor.rowcount == 0:
             return {"success": False, "message": "Usuario no encontrado"}
         return {"success": True, "message": "Usuario actualizado correctamente"}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
 
 # Eliminar usuario
 def delete_user(user_id):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM users WHERE id=?", (user_id,))
-        conn.commit()
+        with get_db() as conn:
+            cursor = conn.execute("DELETE FROM users WHERE id=?", (user_id,))
         if cursor.rowcount == 0:
             return {"success": False, "message": "Usuario no encontrado"}
         return {"success": True, "message": "Usuario eliminado correctamente"}
     except Exception as e:
         return {"success": False, "message": str(e)}
-    finally:
-        conn.close()
@@ -0,0 +1,33 @@
+# test/conftest.py
+# Cada prueba trabaja sobre una base temporal recién migrada (nunca sobre ecommerce.db).
+import os
+import sys
+
+import pytest
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC)
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Apunta database.db_path a un archivo temporal con el esquema actual y lo devuelve."""
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(database, "db_path", path)
+    database.init_db()
+    return path
+
+
+@pytest.fixture
+def cliente(db):
+    """Cliente de prueba de la app sobre la base temporal, con un token válido en `cliente.headers`."""
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+
+    app = create_app({"TESTING": True, "JWT_SECRET_KEY": "clave-de-pruebas-con-longitud-suficiente"})
+    cliente = app.test_client()
+    with app.app_context():
+        cliente.headers = {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+    return cliente
@@ -0,0 +1,78 @@
+# test/test_delta.py
+# Exportación incremental: solo lo cambiado desde la marca de agua, las bajas como tombstones,
+# y la marca avanza únicamente cuando el archivo quedó escrito.
+import json
+
+import pytest
+
+from exports import export_delta as modulo_delta
+from exports.export_products import export_products
+from service.change_service import get_watermark, count_changes
+from service.product_service import create_product, update_product, delete_product
+
+
+def _exportar(directorio):
+    return export_products(None, "ndjson", directorio=str(directorio), incremental=True)
+
+
+def _leer(resultado):
+    with open(resultado["path"], encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f]
+
+
+@pytest.fixture
+def productos(db):
+    for nombre in ("Café", "Arroz", "Té"):
+        assert create_product(nombre, "", 1.0, "A", 5)["success"]
+    return db
+
+
+def test_primera_exportacion_es_completa(productos, tmp_path):
+    assert get_watermark("productos") is None
+    resultado = _exportar(tmp_path)
+    assert resultado["success"], resultado
+    filas = _leer(resultado)
+    assert [(f["operacion"], f["id"]) for f in filas] == [("upsert", 1), ("upsert", 2), ("upsert", 3)]
+    assert get_watermark("productos") == resultado["hasta"]
+    assert count_changes("productos") == 0
+
+
+def test_baja_emite_tombstone_y_avanza_la_marca(productos, tmp_path):
+    primera = _exportar(tmp_path)
+    update_product(1, precio=2.5)
+    delete_product(2)
+    create_product("Mate", "", 3.0, "B", 1)
+    assert count_changes("productos") == 3
+
+    resultado = _exportar(tmp_path)
+    assert resultado["success"], resultado
+    assert (resultado["desde"], get_watermark("productos")) == (primera["hasta"], resultado["hasta"])
+    assert resultado["hasta"] > primera["hasta"]
+    filas = {f["id"]: f for f in _leer(resultado)}
+    assert set(filas) == {1, 2, 4}
+    assert (filas[1]["operacion"], filas[1]["precio"]) == ("upsert", 2.5)
+    # Tombstone: solo operación e id
+    assert filas[2]["operacion"] == "delete"
+    assert all(v is None for k, v in filas[2].items() if k not in ("operacion", "id"))
+    assert (filas[4]["operacion"], filas[4]["nombre"]) == ("upsert", "Mate")
+
+    # Sin cambios nuevos no hay archivo y la marca no se mueve
+    vacia = _exportar(tmp_path)
+    assert not vacia["success"]
+    assert get_watermark("productos") == resultado["hasta"]
+
+
+def test_fallo_al_escribir_no_avanza_la_marca(productos, tmp_path, monkeypatch):
+    primera = _exportar(tmp_path)
+    update_product(3, stock=9)
+
+    def falla(*args, **kwargs):
+        raise OSError("disco lleno")
+
+    with monkeypatch.context() as parche:
+        parche.setattr(modulo_delta, "write_export", falla)
+        assert not _exportar(tmp_path)["success"]
+    assert get_watermark("productos") == primera["hasta"]
+
+    resultado = _exportar(tmp_path)
+    assert [(f["operacion"], f["id"], f["stock"]) for f in _leer(resultado)] == [("upsert", 3, 9)]
@@ -0,0 +1,41 @@
+# test/test_exports.py
+# Exportaciones: el formato se valida igual en todas las rutas y exportadores, y las descargas
+# síncronas no dependen de conexiones libres en el pool.
+import pytest
+
+import database
+from exports.export_products import export_products
+from exports.export_sales import export_sales
+from exports.export_users import export_users
+from service.product_service import create_product
+
+RUTAS = ("/api/productos/exportar", "/api/ventas/exportar", "/api/usuarios/exportar")
+
+
+@pytest.mark.parametrize("ruta", RUTAS)
+@pytest.mark.parametrize("descarga", ["1", "0"])
+def test_formato_desconocido_responde_400(cliente, ruta, descarga):
+    respuesta = cliente.get(f"{ruta}?formato=xml&descarga={descarga}", headers=cliente.headers)
+    assert respuesta.status_code == 400
+    assert "xml" in respuesta.get_json()["message"]
+
+
+@pytest.mark.parametrize("exportar", [export_products, export_sales, export_users])
+def test_exportadores_rechazan_formato_desconocido(db, tmp_path, exportar):
+    resultado = exportar([], "xml", directorio=str(tmp_path))
+    assert not resultado["success"]
+    assert "xml" in resultado["message"]
+
+
+def test_descarga_sin_conexiones_libres_en_el_pool(cliente, db, monkeypatch):
+    create_product("p", "", 1.0, "A", 5)
+    # Todas las conexiones del pool prestadas: la descarga usa la suya propia
+    pool = database.ConnectionPool(db, max_size=1, timeout=0.2)
+    monkeypatch.setattr(database, "_pool", pool)
+    conn = pool.acquire()
+    try:
+        respuesta = cliente.get("/api/productos/exportar?formato=csv&descarga=1", headers=cliente.headers)
+        assert respuesta.status_code == 200
+        assert respuesta.get_data(as_text=True).splitlines()[1].startswith("1,p,")
+    finally:
+        pool.release(conn)
@@ -0,0 +1,90 @@
+# test/test_migrations.py
+# Migraciones versionadas: una base v0 (como el ecommerce.db del repositorio) llega a SCHEMA_VERSION
+# conservando sus datos, y volver a migrar no cambia nada.
+import os
+import shutil
+
+import pytest
+
+import database
+from service.rollup_service import rebuild_rollups
+
+ORIGINAL = os.path.join(database.BASE_DIR, "ecommerce.db")
+
+
+def _esquema(conn):
+    return conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+
+
+def _conteos(conn):
+    return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("users", "productos", "sales")}
+
+
+@pytest.fixture
+def base_v0(tmp_path, monkeypatch):
+    """Copia de ecommerce.db (nunca el original); si no está, una base con solo el esquema base."""
+    path = str(tmp_path / "v0.db")
+    if os.path.exists(ORIGINAL):
+        shutil.copyfile(ORIGINAL, path)
+    else:
+        conn = database.get_connection(path)
+        for sql in database.BASE_SCHEMA:
+            conn.execute(sql)
+        conn.commit()
+        conn.close()
+    monkeypatch.setattr(database, "db_path", path)
+    return path
+
+
+def test_base_v0_migra_hasta_la_version_actual(base_v0):
+    conn = database.get_connection(base_v0)
+    try:
+        assert database.get_schema_version(conn) == 0
+        antes = _conteos(conn)
+        assert database.migrate(conn) == database.SCHEMA_VERSION
+        assert database.get_schema_version(conn) == database.SCHEMA_VERSION
+        assert _conteos(conn) == antes
+
+        tablas = {r["name"] for r in _esquema(conn)}
+        assert {"productos_fts", "sales_rollup", "jobs", "cambios", "token_blocklist",
+                "idx_sales_fecha", "sales_rollup_ai", "sales_rollup_categoria_au"} <= tablas
+        # Los datos existentes entran en el índice FTS y en los rollups
+        assert conn.execute("SELECT COUNT(*) FROM productos_fts").fetchone()[0] == antes["productos"]
+        assert conn.execute("SELECT COALESCE(SUM(ventas), 0) FROM sales_rollup WHERE dimension='dia'").fetchone()[0] \
+            == antes["sales"]
+    finally:
+        conn.close()
+
+
+def test_volver_a_migrar_no_cambia_nada(base_v0):
+    database.init_db()
+    conn = database.get_connection(base_v0)
+    try:
+        esquema, rollups = _esquema(conn), conn.execute("SELECT * FROM sales_rollup ORDER BY 1, 2").fetchall()
+        assert database.migrate(conn) == database.SCHEMA_VERSION
+        database.init_db()
+        assert _esquema(conn) == esquema
+        assert conn.execute("SELECT * FROM sales_rollup ORDER BY 1, 2").fetchall() == rollups
+        assert not conn.in_transaction
+    finally:
+        conn.close()
+    assert database.schema_is_current()
+    assert rebuild_rollups()["success"]
+
+
+def test_migracion_parcial_continua_desde_su_version(tmp_path):
+    path = str(tmp_path / "v3.db")
+    conn = database.get_connection(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for sql in database.BASE_SCHEMA:
+            conn.execute(sql)
+        for pasos in database.MIGRATIONS[:3]:
+            for sql in pasos:
+                conn.execute(sql)
+        conn.execute("PRAGMA user_version=3")
+        conn.commit()
+        assert database.migrate(conn) == database.SCHEMA_VERSION
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name='sales_rollup'").fetchone()
+    finally:
+        conn.close()
@@ -0,0 +1,20 @@
+# test/test_models.py
+# Valores por defecto de los modelos coherentes con los que escribe SQLite.
+from datetime import datetime
+
+import database
+from models import Sale
+from models.base import ahora
+
+
+def test_ahora_usa_utc_como_current_timestamp(db):
+    with database.get_db() as conn:
+        sqlite = conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+    formato = "%Y-%m-%d %H:%M:%S"
+    diferencia = datetime.strptime(ahora(), formato) - datetime.strptime(sqlite, formato)
+    assert abs(diferencia.total_seconds()) < 5
+
+
+def test_fecha_por_defecto_de_venta(db):
+    venta = Sale(id=1, user_id=1, product_id=1, cantidad=1, total=1.0)
+    assert len(venta.fecha) == 19 and venta.fecha[:10] == ahora()[:10]
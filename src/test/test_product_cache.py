@@ -0,0 +1,44 @@
+# test/test_product_cache.py
+# GET /api/productos/<id>: con el producto en caché, el 200 y el 304 salen sin consultar la base.
+import pytest
+
+from service import change_service, product_service
+from service.product_cache import product_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia():
+    product_cache.clear()
+    yield
+    product_cache.clear()
+
+
+def _sin_base(monkeypatch):
+    def prohibido():
+        raise AssertionError("consulta a la base con el producto en caché")
+    monkeypatch.setattr(product_service, "get_db", prohibido)
+    monkeypatch.setattr(change_service, "get_db", prohibido)
+
+
+def test_acierto_de_cache_no_consulta_la_base(cliente, monkeypatch):
+    producto_id = product_service.create_product("p", "", 1.0, "A", 5)["data"].id
+    product_cache.clear()
+    primera = cliente.get(f"/api/productos/{producto_id}", headers=cliente.headers)
+    assert primera.status_code == 200
+    etag = primera.headers["ETag"]
+
+    _sin_base(monkeypatch)
+    segunda = cliente.get(f"/api/productos/{producto_id}", headers=cliente.headers)
+    assert (segunda.status_code, segunda.headers["ETag"]) == (200, etag)
+    condicional = cliente.get(f"/api/productos/{producto_id}", headers={**cliente.headers, "If-None-Match": etag})
+    assert condicional.status_code == 304
+
+
+def test_escritura_invalida_producto_y_version(cliente):
+    producto_id = product_service.create_product("p", "", 1.0, "A", 5)["data"].id
+    etag = cliente.get(f"/api/productos/{producto_id}", headers=cliente.headers).headers["ETag"]
+    assert product_service.update_product(producto_id, precio=2.0)["success"]
+    respuesta = cliente.get(f"/api/productos/{producto_id}", headers={**cliente.headers, "If-None-Match": etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers["ETag"] != etag
+    assert respuesta.get_json()["data"]["precio"] == 2.0
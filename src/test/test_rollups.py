@@ -0,0 +1,93 @@
+# test/test_rollups.py
+# sales_rollup mantenido por triggers: tras altas, cambios y bajas de ventas (y cambios de categoría
+# de productos) los totales coinciden con los esperados y con un recálculo desde cero.
+import pytest
+
+import database
+from service.product_service import update_product, delete_product
+from service.rollup_service import get_rollup, rebuild_rollups
+from service.sales_services import create_sale, update_sale, delete_sale
+
+
+def _rollups():
+    with database.get_db() as conn:
+        return sorted(tuple(r) for r in conn.execute(
+            "SELECT dimension, clave, ventas, unidades, ingresos FROM sales_rollup WHERE ventas <> 0"))
+
+
+def _totales(dimension, **filtros):
+    resultado = get_rollup(dimension, **filtros)
+    assert resultado["success"], resultado
+    return {r["clave"]: (r["ventas"], r["unidades"], r["ingresos"]) for r in resultado["data"]}
+
+
+def _coincide_con_recalculo():
+    antes = _rollups()
+    assert rebuild_rollups()["success"]
+    return antes == _rollups()
+
+
+@pytest.fixture
+def tienda(db):
+    """Usuarios 1 y 2; productos 1..12 (precio 2, stock 100), categoría A los impares y B los pares."""
+    with database.get_db() as conn:
+        conn.executemany("INSERT INTO users (nombres, apellidos, edad, correo, clave_hash, ciudad, pais) "
+                         "VALUES (?, 'X', 30, ?, 'x', 'Lima', 'Perú')", [("Ana", "a@x.com"), ("Luis", "l@x.com")])
+        conn.executemany("INSERT INTO productos (nombre, descripcion, precio, categoria, stock) VALUES (?, '', 2, ?, 100)",
+                         [(f"p{i}", "A" if i % 2 else "B") for i in range(1, 13)])
+    return db
+
+
+def test_alta_cambio_y_baja_de_ventas(tienda):
+    v1 = create_sale(1, 1, 3)["data"]
+    v2 = create_sale(2, 2, 1)["data"]
+    create_sale(1, 10, 4)
+    assert _totales("categoria") == {"A": (1, 3, 6.0), "B": (2, 5, 10.0)}
+    assert _totales("usuario") == {1: (2, 7, 14.0), 2: (1, 1, 2.0)}
+
+    update_sale(v1.id, cantidad=5)
+    delete_sale(v2.id)
+    assert _totales("producto") == {1: (1, 5, 10.0), 10: (1, 4, 8.0)}
+    assert _totales("categoria") == {"A": (1, 5, 10.0), "B": (1, 4, 8.0)}
+    assert _totales("usuario") == {1: (2, 9, 18.0)}
+    assert _coincide_con_recalculo()
+
+
+def test_limites_enteros_en_producto_y_usuario(tienda):
+    for producto in (2, 3, 10, 11):
+        create_sale(1, producto, 1)
+    # Comparados como texto, "10" y "11" quedarían fuera de 2..10
+    assert set(_totales("producto", desde="2", hasta="10")) == {2, 3, 10}
+    assert not get_rollup("producto", desde="dos")["success"]
+    assert set(_totales("usuario", desde="1", hasta="1")) == {1}
+
+
+def test_cambio_de_categoria_mueve_las_ventas(tienda):
+    v = create_sale(1, 1, 2)["data"]
+    create_sale(1, 3, 1)
+    assert update_product(1, categoria="C")["success"]
+    assert _totales("categoria") == {"A": (1, 1, 2.0), "C": (1, 2, 4.0)}
+
+    # Las bajas y cambios posteriores restan del bucket al que se sumó
+    update_sale(v.id, cantidad=1)
+    assert _totales("categoria") == {"A": (1, 1, 2.0), "C": (1, 1, 2.0)}
+    delete_sale(v.id)
+    assert _totales("categoria") == {"A": (1, 1, 2.0)}
+    assert _coincide_con_recalculo()
+
+
+def test_producto_borrado_pasa_a_sin_categoria(tienda):
+    create_sale(1, 4, 2)
+    assert delete_product(4)["success"]
+    assert _totales("categoria") == {"Sin categoría": (1, 2, 4.0)}
+    assert _coincide_con_recalculo()
+
+
+def test_comando_rebuild_rollups(tienda):
+    from app import create_app
+    create_sale(1, 1, 1)
+    with database.get_db() as conn:
+        conn.execute("DELETE FROM sales_rollup")
+    resultado = create_app().test_cli_runner().invoke(args=["rebuild-rollups"])
+    assert resultado.exit_code == 0, resultado.output
+    assert _totales("producto") == {1: (1, 1, 2.0)}
@@ -0,0 +1,108 @@
+# test/test_sales.py
+# Ventas: validación estricta de las líneas, descuento atómico de stock y lotes todo o nada.
+import threading
+
+import pytest
+
+import database
+from service.sales_services import create_sale, create_sales_batch, update_sale, delete_sale
+
+
+def _stock(product_id):
+    with database.get_db() as conn:
+        return conn.execute("SELECT stock FROM productos WHERE id=?", (product_id,)).fetchone()[0]
+
+
+def _contar_ventas():
+    with database.get_db() as conn:
+        return conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+
+
+@pytest.fixture
+def tienda(db):
+    """Un usuario (id 1) y dos productos: id 1 (precio 10, stock 5) e id 2 (precio 3, stock 2)."""
+    with database.get_db() as conn:
+        conn.execute("INSERT INTO users (nombres, apellidos, edad, correo, clave_hash, ciudad, pais) "
+                     "VALUES ('Ana', 'Paz', 30, 'ana@example.com', 'x', 'Lima', 'Perú')")
+        conn.executemany("INSERT INTO productos (nombre, descripcion, precio, categoria, stock) VALUES (?, '', ?, ?, ?)",
+                         [("Café", 10.0, "Bebidas", 5), ("Arroz", 3.0, "Abarrotes", 2)])
+    return db
+
+
+@pytest.mark.parametrize("linea", [
+    {"user_id": 1, "product_id": True, "cantidad": 1},
+    {"user_id": 1, "product_id": 1, "cantidad": True},
+    {"user_id": False, "product_id": 1, "cantidad": 1},
+    {"user_id": 1, "product_id": "1", "cantidad": 1},
+    {"user_id": 1, "product_id": 1, "cantidad": 1.0},
+])
+def test_rechaza_booleanos_y_no_enteros(tienda, linea):
+    lote = create_sales_batch([linea])
+    assert not lote["success"] and lote["status"] == 400
+    simple = create_sale(linea["user_id"], linea["product_id"], linea["cantidad"])
+    assert not simple["success"] and simple["status"] == 400
+    assert _stock(1) == 5
+    assert _contar_ventas() == 0
+
+
+def test_compras_concurrentes_no_sobrevenden(tienda):
+    hilos, resultados = 20, []
+    salida = threading.Barrier(hilos)
+
+    def comprar():
+        salida.wait()
+        resultados.append(create_sale(1, 1, 1))
+
+    trabajadores = [threading.Thread(target=comprar) for _ in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+
+    exitosas = [r for r in resultados if r["success"]]
+    assert len(exitosas) == 5
+    assert all(r["message"] == "Stock insuficiente" for r in resultados if not r["success"])
+    assert _stock(1) == 0
+    assert _contar_ventas() == 5
+
+
+def test_venta_actualizada_y_borrada_ajusta_stock(tienda):
+    venta = create_sale(1, 1, 2)["data"]
+    assert (_stock(1), venta.total) == (3, 20.0)
+
+    # Más de lo que queda: no cambia nada
+    assert update_sale(venta.id, cantidad=6)["message"] == "Stock insuficiente"
+    assert _stock(1) == 3
+
+    actualizada = update_sale(venta.id, cantidad=5)["data"]
+    assert (_stock(1), actualizada.cantidad, actualizada.total) == (0, 5, 50.0)
+    assert delete_sale(venta.id)["success"]
+    assert (_stock(1), _contar_ventas()) == (5, 0)
+
+
+@pytest.mark.parametrize("mala, mensaje", [
+    ({"user_id": 1, "product_id": 99, "cantidad": 1}, "Producto no encontrado"),
+    ({"user_id": 1, "product_id": 2, "cantidad": 3}, "Stock insuficiente"),
+])
+def test_lote_con_una_linea_mala_no_guarda_nada(tienda, mala, mensaje):
+    lineas = [{"user_id": 1, "product_id": 1, "cantidad": 2}, mala, {"user_id": 1, "product_id": 1, "cantidad": 1}]
+    resultado = create_sales_batch(lineas)
+    assert not resultado["success"] and resultado["status"] == 400
+    assert [l["success"] for l in resultado["lineas"]] == [True, False, True]
+    assert resultado["lineas"][1]["message"] == mensaje
+    assert (_stock(1), _stock(2), _contar_ventas()) == (5, 2, 0)
+
+
+def test_lote_suma_las_lineas_del_mismo_producto(tienda):
+    # 2 + 1 unidades de Arroz con stock 2: el lote entero se rechaza aunque cada línea cabría sola
+    lineas = [{"user_id": 1, "product_id": 2, "cantidad": 2}, {"user_id": 1, "product_id": 2, "cantidad": 1}]
+    assert not create_sales_batch(lineas)["success"]
+    assert (_stock(2), _contar_ventas()) == (2, 0)
+
+    lineas = [{"user_id": 1, "product_id": 1, "cantidad": 2}, {"user_id": 1, "product_id": 2, "cantidad": 2},
+              {"user_id": 1, "product_id": 1, "cantidad": 3}]
+    resultado = create_sales_batch(lineas)
+    assert resultado["success"]
+    assert [(l["data"].product_id, l["data"].cantidad, l["data"].total) for l in resultado["lineas"]] == \
+        [(1, 2, 20.0), (2, 2, 6.0), (1, 3, 30.0)]
+    assert (_stock(1), _stock(2), _contar_ventas()) == (0, 0, 3)
@@ -0,0 +1,89 @@
+# test/test_scraper.py
+# Importación de punta a punta contra un servidor HTTP local que sirve bench/fixtures.
+# Uso (desde src/): python -m pytest -q test/test_scraper.py
+import functools
+import os
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+
+import database
+from service import scraper_cache, scraper_service
+from service.scraper_service import import_products, parse_listing_page
+
+FIXTURES = os.path.join(os.path.dirname(database.__file__), "bench", "fixtures")
+
+
+class _Silencioso(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def servidor():
+    handler = functools.partial(_Silencioso, directory=FIXTURES)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def entorno(db, tmp_path, monkeypatch):
+    """Base y caché del scraper temporales; el servidor local pasa a ser un host permitido."""
+    monkeypatch.setattr(scraper_cache, "_cache", scraper_cache.ScraperCache(str(tmp_path / "cache.db")))
+    monkeypatch.setattr(scraper_service, "ALLOWED_HOSTS", scraper_service.ALLOWED_HOSTS | {"127.0.0.1"})
+
+
+def _contar_productos():
+    with database.get_db() as conn:
+        return conn.execute("SELECT COUNT(*) FROM productos").fetchone()[0]
+
+
+def test_importa_listado_y_reimportar_actualiza(servidor):
+    url = f"{servidor}/listado.html"
+    with open(os.path.join(FIXTURES, "listado.html"), encoding="utf-8") as f:
+        esperados = len(parse_listing_page(f.read(), url))
+    assert esperados > 0
+
+    resultado = import_products(listing_url=url, paginas=1)
+    assert resultado["success"], resultado
+    assert resultado["insertados"] == esperados
+    assert resultado["errores"] == []
+    assert _contar_productos() == esperados
+
+    # Misma url_origen: se actualiza en vez de duplicar
+    resultado = import_products(listing_url=url, paginas=1)
+    assert resultado["success"], resultado
+    assert (resultado["insertados"], resultado["actualizados"]) == (0, esperados)
+    assert _contar_productos() == esperados
+
+
+def test_importa_paginas_de_producto(servidor):
+    urls = [f"{servidor}/producto.html", f"{servidor}/no-existe.html"]
+    resultado = import_products(urls=urls)
+    assert resultado["success"], resultado
+    assert resultado["insertados"] == 1
+    assert resultado["productos"] == ['Laptop Lenovo IdeaPad 3 15"']
+    assert [e["url"] for e in resultado["errores"]] == [urls[1]]
+
+
+def test_rechaza_hosts_y_esquemas_no_permitidos(servidor):
+    for url in ("http://169.254.169.254/latest/meta-data/", "file:///etc/passwd",
+                servidor.replace("127.0.0.1", "localhost") + "/listado.html"):
+        resultado = import_products(listing_url=url)
+        assert not resultado["success"]
+        assert resultado["status"] == 400
+    resultado = import_products(urls=[f"{servidor}/producto.html", "ftp://127.0.0.1/producto.html"])
+    assert resultado["status"] == 400
+    assert [e["url"] for e in resultado["errores"]] == ["ftp://127.0.0.1/producto.html"]
+    assert _contar_productos() == 0
+
+
+@pytest.mark.parametrize("paginas", [0, -1, scraper_service.MAX_PAGINAS + 1, "2", None])
+def test_rechaza_paginas_fuera_de_rango(servidor, paginas):
+    resultado = import_products(listing_url=f"{servidor}/listado.html", paginas=paginas)
+    assert not resultado["success"]
+    assert resultado["status"] == 400
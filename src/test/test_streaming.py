@@ -0,0 +1,44 @@
+# test/test_streaming.py
+# Las respuestas en streaming no usan conexiones del pool: clientes lentos no bloquean al resto.
+import database
+from service.product_service import create_product, stream_products, get_product_by_id
+
+
+def test_streams_abiertos_no_agotan_el_pool(db, monkeypatch):
+    # Pool con espera corta: si un stream retuviera una conexión, la consulta final fallaría enseguida
+    monkeypatch.setattr(database, "_pool", database.ConnectionPool(db, timeout=0.5))
+    for i in range(3):
+        assert create_product(f"p{i}", "", 1.0, "A", 5)["success"]
+
+    # Más streams a medio leer que conexiones tiene el pool
+    streams = [stream_products()["data"] for _ in range(database.POOL_SIZE + 2)]
+    for chunks in streams:
+        assert len(next(chunks)) == 3
+
+    assert get_product_by_id(1)["success"]
+    with database.get_db() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM productos").fetchone()[0] == 3
+    for chunks in streams:
+        chunks.close()
+
+
+def test_stream_cierra_su_conexion(db, monkeypatch):
+    cerradas = []
+    original = database.get_connection
+
+    def espiar(*args, **kwargs):
+        conn = original(*args, **kwargs)
+        cerradas.append(conn)
+        return conn
+
+    monkeypatch.setattr(database, "get_connection", espiar)
+    create_product("p", "", 1.0, "A", 5)
+    chunks = stream_products()["data"]
+    next(chunks)
+    chunks.close()
+    stream = cerradas[-1]
+    try:
+        stream.execute("SELECT 1")
+        assert False, "la conexión del stream sigue abierta"
+    except database.sqlite3.ProgrammingError:
+        pass